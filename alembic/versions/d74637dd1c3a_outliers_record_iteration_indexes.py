@@ -0,0 +1,59 @@
+"""(record_id, iteration) indexes on outliers tables
+
+Revision ID: d74637dd1c3a
+Revises: fe1175ddc17d
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d74637dd1c3a"
+down_revision: Union[str, None] = "fe1175ddc17d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# таблица выбросов -> (имя индекса, ссылка на точку ряда)
+INDEXES = {
+    "outliers_records": (
+        "ix_outliers_records_raw_record_id_iteration",
+        "raw_record_id",
+    ),
+    "processed_records_outliers_records": (
+        "ix_processed_records_outliers_records_record_id_iteration",
+        "processed_record_id",
+    ),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY нельзя выполнять внутри транзакции
+    with op.get_context().autocommit_block():
+        for table, (name, record_id) in INDEXES.items():
+            op.create_index(
+                name,
+                table,
+                [record_id, "outliers_search_iteration_num"],
+                unique=False,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for table, (name, _) in INDEXES.items():
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
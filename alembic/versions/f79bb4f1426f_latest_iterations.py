@@ -0,0 +1,78 @@
+"""latest_iterations pointer table
+
+Revision ID: f79bb4f1426f
+Revises: d74637dd1c3a
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f79bb4f1426f"
+down_revision: Union[str, None] = "d74637dd1c3a"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Начальное состояние указателей — максимальные итерации из истории.
+# Итерация, которая пишется во время миграции, будет считаться завершённой;
+# дальше указатель двигает только POST /post_data/iteration_completed
+BACKFILL = """
+INSERT INTO latest_iterations (email, kind, data_type, iteration_num, completed_at)
+SELECT r.email, 'raw_outliers', r.data_type,
+       max(o.outliers_search_iteration_num), max(o.outliers_search_iteration_datetime)
+FROM outliers_records o JOIN raw_records r ON r.id = o.raw_record_id
+GROUP BY r.email, r.data_type
+UNION ALL
+SELECT r.email, 'processed_outliers', r.data_type,
+       max(o.outliers_search_iteration_num), max(o.outliers_search_iteration_datetime)
+FROM processed_records_outliers_records o
+JOIN processed_records r ON r.id = o.processed_record_id
+GROUP BY r.email, r.data_type
+UNION ALL
+SELECT email, 'ml_predictions', '', max(iteration_num), max(iteration_datetime)
+FROM ml_predictions_records
+GROUP BY email
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "latest_iterations",
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("data_type", sa.String(), server_default="", nullable=False),
+        sa.Column("iteration_num", sa.Integer(), nullable=False),
+        sa.Column("completed_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("email", "kind", "data_type"),
+    )
+    op.execute(BACKFILL)
+
+    # CONCURRENTLY нельзя выполнять внутри транзакции
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_ml_predictions_records_email_iteration_num",
+            "ml_predictions_records",
+            ["email", "iteration_num"],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_ml_predictions_records_email_iteration_num",
+            table_name="ml_predictions_records",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    op.drop_table("latest_iterations")
@@ -0,0 +1,57 @@
+"""drop redundant single-column id/time series indexes
+
+Revision ID: fb29bfc9ce2e
+Revises: a4a57f22db3d
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "fb29bfc9ce2e"
+down_revision: Union[str, None] = "a4a57f22db3d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TABLES = ("raw_records", "processed_records")
+# id покрыт первичным ключом, отдельный time запросами не используется.
+# ix_{table}_email остаётся до fe1175ddc17d: там строится итоговый составной
+# индекс (email, data_type, time) INCLUDE (id, value_num), который его заменяет —
+# промежуточный индекс с INCLUDE (id, value) не строится, чтобы не делать
+# два полных построения подряд
+COLUMNS = ("id", "time")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY нельзя выполнять внутри транзакции
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            for column in COLUMNS:
+                op.drop_index(
+                    f"ix_{table}_{column}",
+                    table_name=table,
+                    postgresql_concurrently=True,
+                    if_exists=True,
+                )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            for column in COLUMNS:
+                op.create_index(
+                    f"ix_{table}_{column}",
+                    table,
+                    [column],
+                    unique=False,
+                    postgresql_concurrently=True,
+                    if_not_exists=True,
+                )
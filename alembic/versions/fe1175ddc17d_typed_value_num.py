@@ -0,0 +1,135 @@
+"""typed value_num column filled by trigger
+
+Revision ID: fe1175ddc17d
+Revises: fb29bfc9ce2e
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "fe1175ddc17d"
+down_revision: Union[str, None] = "fb29bfc9ce2e"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TABLES = ("raw_records", "processed_records")
+# Шаг по id при заполнении существующих строк: одна короткая транзакция на пачку
+BACKFILL_BATCH_SIZE = 50_000
+
+# value -> double precision; NULL для нечисловых строк и значений
+# вне диапазона double (каст в таком случае упал бы с ошибкой)
+PARSE_VALUE_NUM = r"""
+CREATE OR REPLACE FUNCTION parse_value_num(v text) RETURNS double precision
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT CASE
+        WHEN v ~ '^\s*[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d{1,4})?\s*$' THEN
+            CASE
+                WHEN v::numeric = 0
+                    OR abs(v::numeric) BETWEEN 1e-307 AND 1e308
+                THEN v::double precision
+            END
+    END
+$$
+"""
+
+SET_VALUE_NUM = """
+CREATE OR REPLACE FUNCTION set_value_num() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.value_num := parse_value_num(NEW.value);
+    RETURN NEW;
+END
+$$
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Записи создаёт сервис обработки, поэтому value_num заполняет триггер,
+    # а не код этого API
+    op.execute(PARSE_VALUE_NUM)
+    op.execute(SET_VALUE_NUM)
+    for table in TABLES:
+        op.add_column(table, sa.Column("value_num", sa.Double(), nullable=True))
+        op.execute(
+            f"CREATE TRIGGER {table}_set_value_num "
+            f"BEFORE INSERT OR UPDATE OF value ON {table} "
+            f"FOR EACH ROW EXECUTE FUNCTION set_value_num()"
+        )
+
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            _backfill(table)
+            op.create_index(
+                f"ix_{table}_email_data_type_time_num",
+                table,
+                ["email", "data_type", "time"],
+                unique=False,
+                postgresql_include=["id", "value_num"],
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+            # email — префикс нового индекса. ix_{table}_email_data_type_time
+            # с INCLUDE (id, value) строила прежняя версия fb29bfc9ce2e — удаляем,
+            # если база успела её применить
+            for name in ("email", "email_data_type_time"):
+                op.drop_index(
+                    f"ix_{table}_{name}",
+                    table_name=table,
+                    postgresql_concurrently=True,
+                    if_exists=True,
+                )
+
+
+def _backfill(table: str) -> None:
+    """Заполняет value_num у существующих строк пачками по id."""
+    update = (
+        f"UPDATE {table} SET value_num = parse_value_num(value) "
+        f"WHERE value_num IS NULL"
+    )
+    if context.is_offline_mode():
+        op.execute(update)
+        return
+
+    bind = op.get_bind()
+    lo, hi = bind.execute(sa.text(f"SELECT min(id), max(id) FROM {table}")).one()
+    if lo is None:
+        return
+    for start in range(lo, hi + 1, BACKFILL_BATCH_SIZE):
+        bind.execute(
+            sa.text(f"{update} AND id >= :start AND id < :stop"),
+            {"start": start, "stop": start + BACKFILL_BATCH_SIZE},
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            op.create_index(
+                f"ix_{table}_email",
+                table,
+                ["email"],
+                unique=False,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+            op.drop_index(
+                f"ix_{table}_email_data_type_time_num",
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
+
+    for table in TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_set_value_num ON {table}")
+        op.drop_column(table, "value_num")
+    op.execute("DROP FUNCTION IF EXISTS set_value_num()")
+    op.execute("DROP FUNCTION IF EXISTS parse_value_num(text)")
@@ -4,29 +4,60 @@ import qrcode
 
 from typing import List
 
-from fastapi import APIRouter, HTTPException, status, BackgroundTasks, Depends
+from fastapi import (
+    APIRouter,
+    HTTPException,
+    status,
+    BackgroundTasks,
+    Depends,
+    Query,
+    Request,
+    Response,
+)
 from fastapi.responses import StreamingResponse
 
 
-from sqlalchemy import select, func
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.concurrency import run_in_threadpool
 
 from app.services.auth import get_current_user
-from app.services.db.db_session import get_session
+from app.services.db.db_session import get_read_session
 from app.services.db.engine import db_engine
+from app.services.db.queries import (
+    raw_records_rows_select,
+    latest_iteration_select,
+    ml_predictions_history_select,
+)
 from app.services.db.schemas import (
     RawRecords,
-    OutliersRecords,
     MLPredictionsRecords,
-    ProcessedRecords,
-    ProcessedRecordsOutliersRecords,
+)
+from app.services.aggregation import aggregate_stmt
+from app.services.conditional import (
+    is_not_modified,
+    make_etag,
+    not_modified,
+    validator_headers,
 )
 from app.services.FHIR import FHIRTransformer
-from app.models.models import DataType, DataRecord, DataWithOutliers, Prediction
+from app.services.series import read_series, read_series_with_outliers
+from app.services.sync_state import get_sync_state
+from app.services.utils import LATEST_ITERATION_LOOKUPS
+from app.models.models import (
+    AggregateBucket,
+    AggregateFunction,
+    DataType,
+    DataRecord,
+    DataWithOutliers,
+    IterationKind,
+    Prediction,
+    SeriesSource,
+    SyncStateItem,
+)
 from app.settings import settings, security
-from app.services.redisClient import redis_client_async
-from datetime import timezone
+from app.services.series_response import columnar_response, columns
+from datetime import datetime, timezone
 
 
 api_v2_get_data_router = APIRouter(prefix="/get_data", tags=["get_data"])
@@ -39,12 +70,30 @@ api_v2_get_data_router = APIRouter(prefix="/get_data", tags=["get_data"])
 )
 async def get_raw_data_type(
     data_type: DataType,
+    from_: datetime | None = Query(None, alias="from"),
+    to: datetime | None = None,
+    cursor: str | None = None,
+    limit: int | None = Query(None, ge=1),
+    max_points: int | None = Query(None, ge=3),
+    columnar: bool = False,
+    epoch_ms: bool = False,
     token=Depends(security),
     user_data=Depends(get_current_user),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
 ) -> List[DataRecord]:
     """
     Возвращает данные пользователя по типу: [(timestamp, value), ...]
+    в окне [from, to); точки с нечисловым value (value_num IS NULL)
+    пропускаются. Ряд отдаётся страницами не больше SERIES_MAX_PAGE_SIZE точек
+    (столько же и по умолчанию, без `limit`). Если есть следующая страница,
+    её курсор приходит в заголовке X-Next-Cursor: запрос без параметров
+    отдаёт весь ряд, только пока в нём не больше SERIES_MAX_PAGE_SIZE точек.
+    С `max_points` всё окно (не больше SERIES_DOWNSAMPLE_MAX_SOURCE_POINTS
+    точек, иначе 400) прореживается LTTB до ~min(max_points, limit) точек
+    и отдаётся одним ответом, без X-Next-Cursor.
+    С `columnar=true` ответ — {"X": [...], "Y": [...]} (X в мс при `epoch_ms=true`).
+    Готовый ответ кешируется в Redis (series_cache) до следующего
+    обновления данных пользователя сервисом обработки.
     """
     current_user_email = user_data.email
     if not current_user_email:
@@ -52,29 +101,19 @@ async def get_raw_data_type(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Email not provided"
         )
 
-    try:
-        stmt = (
-            select(RawRecords)
-            .where(
-                (RawRecords.data_type == data_type.value)
-                & (RawRecords.email == current_user_email)
-            )
-            .order_by(RawRecords.time)
-        )
-        result = await session.execute(stmt)
-        records = result.scalars().all()
-
-        return [
-            DataRecord(
-                X=rec.time.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
-                Y=float(str(rec.value)),
-            )
-            for rec in records
-        ]
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error: {str(e)}"
-        )
+    return await read_series(
+        session,
+        SeriesSource.RAW,
+        current_user_email,
+        data_type.value,
+        from_=from_,
+        to=to,
+        cursor=cursor,
+        limit=limit,
+        max_points=max_points,
+        columnar=columnar,
+        epoch_ms=epoch_ms,
+    )
 
 
 @api_v2_get_data_router.get(
@@ -84,12 +123,30 @@ async def get_raw_data_type(
 )
 async def get_processed_data_type(
     data_type: DataType,
+    from_: datetime | None = Query(None, alias="from"),
+    to: datetime | None = None,
+    cursor: str | None = None,
+    limit: int | None = Query(None, ge=1),
+    max_points: int | None = Query(None, ge=3),
+    columnar: bool = False,
+    epoch_ms: bool = False,
     token=Depends(security),
     user_data=Depends(get_current_user),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
 ) -> List[DataRecord]:
     """
     Возвращает данные пользователя по типу: [(timestamp, value), ...]
+    в окне [from, to); точки с нечисловым value (value_num IS NULL)
+    пропускаются. Ряд отдаётся страницами не больше SERIES_MAX_PAGE_SIZE точек
+    (столько же и по умолчанию, без `limit`). Если есть следующая страница,
+    её курсор приходит в заголовке X-Next-Cursor: запрос без параметров
+    отдаёт весь ряд, только пока в нём не больше SERIES_MAX_PAGE_SIZE точек.
+    С `max_points` всё окно (не больше SERIES_DOWNSAMPLE_MAX_SOURCE_POINTS
+    точек, иначе 400) прореживается LTTB до ~min(max_points, limit) точек
+    и отдаётся одним ответом, без X-Next-Cursor.
+    С `columnar=true` ответ — {"X": [...], "Y": [...]} (X в мс при `epoch_ms=true`).
+    Готовый ответ кешируется в Redis (series_cache) до следующего
+    обновления данных пользователя сервисом обработки.
     """
     current_user_email = user_data.email
     if not current_user_email:
@@ -97,29 +154,19 @@ async def get_processed_data_type(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Email not provided"
         )
 
-    try:
-        stmt = (
-            select(ProcessedRecords)
-            .where(
-                (ProcessedRecords.data_type == data_type.value)
-                & (ProcessedRecords.email == current_user_email)
-            )
-            .order_by(ProcessedRecords.time)
-        )
-        result = await session.execute(stmt)
-        records = result.scalars().all()
-
-        return [
-            DataRecord(
-                X=rec.time.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
-                Y=float(str(rec.value)),
-            )
-            for rec in records
-        ]
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error: {str(e)}"
-        )
+    return await read_series(
+        session,
+        SeriesSource.PROCESSED,
+        current_user_email,
+        data_type.value,
+        from_=from_,
+        to=to,
+        cursor=cursor,
+        limit=limit,
+        max_points=max_points,
+        columnar=columnar,
+        epoch_ms=epoch_ms,
+    )
 
 
 @api_v2_get_data_router.get(
@@ -130,15 +177,24 @@ async def get_processed_data_type(
 )
 async def get_raw_data_with_outliers(
     data_type: DataType,
+    request: Request,
+    max_points: int | None = Query(None, ge=3),
+    columnar: bool = False,
+    epoch_ms: bool = False,
     token=Depends(security),
     user_data=Depends(get_current_user),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
 ) -> DataWithOutliers:
     """
     Возвращает:
-      - data: все точки (X = UNIX-время, Y = значение)
+      - data: все точки с числовым value (X = UNIX-время, Y = значение)
       - outliersX: список X (UNIX-времён) точек, которые считаются выбросами
-        и уже сохранены в таблице OutliersRecords для последней итерации.
+        в последней завершённой итерации поиска выбросов.
+    С `max_points` data прореживается LTTB; точки из outliersX остаются всегда.
+    С `columnar=true` data отдаётся колонками {"X": [...], "Y": [...]}
+    (X и outliersX в мс при `epoch_ms=true`).
+    ETag строится по (max(id), count) ряда и номеру итерации выбросов:
+    If-None-Match с ним получает 304 без выборки самих точек.
     """
     email = user_data.email
     if not email:
@@ -146,69 +202,16 @@ async def get_raw_data_with_outliers(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Email не передан"
         )
 
-    try:
-        stmt_all = (
-            select(RawRecords)
-            .where(
-                (RawRecords.data_type == data_type.value) & (RawRecords.email == email)
-            )
-            .order_by(RawRecords.time)
-        )
-        all_result = await session.execute(stmt_all)
-        all_records = all_result.scalars().all()
-        data = [
-            DataRecord(
-                X=rec.time.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
-                Y=float(rec.value),
-            )
-            for rec in all_records
-        ]
-
-        iter_num_query = (
-            select(func.max(OutliersRecords.outliers_search_iteration_num))
-            .join(RawRecords, OutliersRecords.raw_record_id == RawRecords.id)
-            .where(
-                (RawRecords.data_type == data_type.value) & (RawRecords.email == email)
-            )
-        )
-
-        REDIS_KEY = f"{settings.REDIS_FIND_OUTLIERS_JOB_IS_ACTIVE_NAMESPACE}{email}"
-        flag = await redis_client_async.get(REDIS_KEY)
-
-        max_iter = await session.scalar(iter_num_query)
-
-        if flag == "true" and max_iter is not None:
-            max_iter = max_iter - 1
-
-        if max_iter is None:
-            max_iter = 0
-
-        stmt_out = (
-            select(RawRecords)
-            .join(
-                OutliersRecords,
-                (OutliersRecords.raw_record_id == RawRecords.id)
-                & (OutliersRecords.outliers_search_iteration_num == max_iter),
-            )
-            .where(
-                (RawRecords.data_type == data_type.value) & (RawRecords.email == email)
-            )
-            .order_by(RawRecords.time)
-        )
-        out_result = await session.execute(stmt_out)
-        outlier_recs = out_result.scalars().all()
-        outliersX = [
-            rec.time.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
-            for rec in outlier_recs
-        ]
-
-        return DataWithOutliers(data=data, outliersX=outliersX)
-
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Ошибка при выборке данных: {e}",
-        )
+    return await read_series_with_outliers(
+        session,
+        request,
+        SeriesSource.RAW,
+        email,
+        data_type.value,
+        max_points=max_points,
+        columnar=columnar,
+        epoch_ms=epoch_ms,
+    )
 
 
 @api_v2_get_data_router.get(
@@ -219,15 +222,24 @@ async def get_raw_data_with_outliers(
 )
 async def get_processed_data_with_outliers(
     data_type: DataType,
+    request: Request,
+    max_points: int | None = Query(None, ge=3),
+    columnar: bool = False,
+    epoch_ms: bool = False,
     token=Depends(security),
     user_data=Depends(get_current_user),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
 ) -> DataWithOutliers:
     """
     Возвращает:
-      - data: все точки (X = UNIX-время, Y = значение)
+      - data: все точки с числовым value (X = UNIX-время, Y = значение)
       - outliersX: список X (UNIX-времён) точек, которые считаются выбросами
-        и уже сохранены в таблице OutliersRecords для последней итерации.
+        в последней завершённой итерации поиска выбросов.
+    С `max_points` data прореживается LTTB; точки из outliersX остаются всегда.
+    С `columnar=true` data отдаётся колонками {"X": [...], "Y": [...]}
+    (X и outliersX в мс при `epoch_ms=true`).
+    ETag строится по (max(id), count) ряда и номеру итерации выбросов:
+    If-None-Match с ним получает 304 без выборки самих точек.
     """
     email = user_data.email
     if not email:
@@ -235,103 +247,44 @@ async def get_processed_data_with_outliers(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Email не передан"
         )
 
-    try:
-        stmt_all = (
-            select(ProcessedRecords)
-            .where(
-                (ProcessedRecords.data_type == data_type.value)
-                & (ProcessedRecords.email == email)
-            )
-            .order_by(ProcessedRecords.time)
-        )
-        all_result = await session.execute(stmt_all)
-        all_records = all_result.scalars().all()
-        data = [
-            DataRecord(
-                X=rec.time.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
-                Y=float(rec.value),
-            )
-            for rec in all_records
-        ]
-
-        iter_num_query = (
-            select(
-                func.max(ProcessedRecordsOutliersRecords.outliers_search_iteration_num)
-            )
-            .join(
-                ProcessedRecords,
-                ProcessedRecordsOutliersRecords.processed_record_id
-                == ProcessedRecords.id,
-            )
-            .where(
-                (ProcessedRecords.data_type == data_type.value)
-                & (ProcessedRecords.email == email)
-            )
-        )
-
-        REDIS_KEY = f"{settings.REDIS_FIND_OUTLIERS_JOB_IS_ACTIVE_NAMESPACE}{email}"
-        flag = await redis_client_async.get(REDIS_KEY)
-
-        max_iter = await session.scalar(iter_num_query)
-
-        if flag == "true" and max_iter is not None:
-            max_iter = max_iter - 1
-
-        if max_iter is None:
-            max_iter = 0
-
-        stmt_out = (
-            select(ProcessedRecords)
-            .join(
-                ProcessedRecordsOutliersRecords,
-                (
-                    ProcessedRecordsOutliersRecords.processed_record_id
-                    == ProcessedRecords.id
-                )
-                & (
-                    ProcessedRecordsOutliersRecords.outliers_search_iteration_num
-                    == max_iter
-                ),
-            )
-            .where(
-                (ProcessedRecords.data_type == data_type.value)
-                & (ProcessedRecords.email == email)
-            )
-            .order_by(ProcessedRecords.time)
-        )
-        out_result = await session.execute(stmt_out)
-        outlier_recs = out_result.scalars().all()
-        outliersX = [
-            rec.time.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
-            for rec in outlier_recs
-        ]
-
-        return DataWithOutliers(data=data, outliersX=outliersX)
-
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Ошибка при выборке данных: {e}",
-        )
+    return await read_series_with_outliers(
+        session,
+        request,
+        SeriesSource.PROCESSED,
+        email,
+        data_type.value,
+        max_points=max_points,
+        columnar=columnar,
+        epoch_ms=epoch_ms,
+    )
 
 
 @api_v2_get_data_router.get(
-    "/processed_data_with_outliers/{data_type}",
-    response_model=DataWithOutliers,
+    "/aggregate/{data_type}",
+    response_model=List[DataRecord],
     status_code=status.HTTP_200_OK,
-    summary="Получить данные и заранее вычисленные выбросы (последней итерации)",
+    summary="Агрегат ряда по корзинам времени (avg/min/max/sum/count)",
 )
-async def get_processed_data_with_outliers(
+async def get_aggregated_data(
     data_type: DataType,
+    bucket: AggregateBucket,
+    agg: AggregateFunction = AggregateFunction.AVG,
+    source: SeriesSource = SeriesSource.RAW,
+    from_: datetime | None = Query(None, alias="from"),
+    to: datetime | None = None,
+    columnar: bool = False,
+    epoch_ms: bool = False,
     token=Depends(security),
     user_data=Depends(get_current_user),
-    session: AsyncSession = Depends(get_session),
-) -> DataWithOutliers:
+    session: AsyncSession = Depends(get_read_session),
+) -> List[DataRecord]:
     """
-    Возвращает:
-      - data: все точки (X = UNIX-время, Y = значение)
-      - outliersX: список X (UNIX-времён) точек, которые считаются выбросами
-        и уже сохранены в таблице OutliersRecords для последней итерации.
+    Возвращает [(начало корзины, агрегат), ...] по raw_records или
+    processed_records (`source`) в окне [from, to); агрегирование
+    выполняется в Postgres, пустые корзины не возвращаются.
+    avg/min/max/sum считаются по числовым значениям (корзины только
+    с нечисловыми value пропускаются), count — по всем записям корзины.
+    `columnar` / `epoch_ms` — как у /raw_data/{data_type}.
     """
     email = user_data.email
     if not email:
@@ -339,81 +292,65 @@ async def get_processed_data_with_outliers(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Email не передан"
         )
 
+    limit = settings.SERIES_MAX_PAGE_SIZE
+    stmt = aggregate_stmt(
+        source, email, data_type.value, bucket, agg, from_, to, limit + 1
+    )
+
     try:
-        stmt_all = (
-            select(RawRecords)
-            .where(
-                (RawRecords.data_type == data_type.value) & (RawRecords.email == email)
-            )
-            .order_by(RawRecords.time)
+        rows = (await session.execute(stmt)).all()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Ошибка при агрегации данных: {e}",
         )
-        all_result = await session.execute(stmt_all)
-        all_records = all_result.scalars().all()
-        data = [
-            DataRecord(
-                X=rec.time.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
-                Y=float(rec.value),
-            )
-            for rec in all_records
-        ]
 
-        iter_num_query = (
-            select(
-                func.max(ProcessedRecordsOutliersRecords.outliers_search_iteration_num)
-            )
-            .join(
-                ProcessedRecords,
-                ProcessedRecordsOutliersRecords.raw_record_id == ProcessedRecords.id,
-            )
-            .where(
-                (ProcessedRecords.data_type == data_type.value)
-                & (ProcessedRecords.email == email)
-            )
-            .order_by(ProcessedRecords.time)
+    if len(rows) > limit:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Больше {limit} корзин: сузьте окно from/to или увеличьте bucket",
         )
 
-        REDIS_KEY = f"{settings.REDIS_FIND_OUTLIERS_JOB_IS_ACTIVE_NAMESPACE}{email}"
-        flag = await redis_client_async.get(REDIS_KEY)
-        max_iter = await session.scalar(iter_num_query)
+    if columnar:
+        return columnar_response(columns(rows, epoch_ms))
 
-        if flag == "true" and max_iter is not None:
-            max_iter = max_iter - 1
+    return [
+        DataRecord(
+            X=bucket_start.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            Y=value,
+        )
+        for bucket_start, value in rows
+    ]
 
-        if max_iter is None:
-            max_iter = 0
 
-        stmt_out = (
-            select(ProcessedRecords)
-            .join(
-                ProcessedRecordsOutliersRecords,
-                (
-                    ProcessedRecordsOutliersRecords.processed_record_id
-                    == ProcessedRecords.id
-                )
-                & (
-                    ProcessedRecordsOutliersRecords.outliers_search_iteration_num
-                    == max_iter
-                ),
-            )
-            .where(
-                (ProcessedRecords.data_type == data_type.value)
-                & (ProcessedRecords.email == email)
-            )
-            .order_by(ProcessedRecords.time)
+@api_v2_get_data_router.get(
+    "/sync_state",
+    response_model=List[SyncStateItem],
+    status_code=status.HTTP_200_OK,
+    summary="Что уже есть на сервере: последнее время и число записей по типам",
+)
+async def get_user_sync_state(
+    token=Depends(security),
+    user_data=Depends(get_current_user),
+    session: AsyncSession = Depends(get_read_session),
+) -> List[SyncStateItem]:
+    """
+    Возвращает для каждого типа данных пользователя в raw_records
+    время последней записи (lastX) и их количество, чтобы клиент
+    отправлял в /post_data/raw_data/{data_type} только новые данные.
+    """
+    email = user_data.email
+    if not email:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Email не передан"
         )
-        out_result = await session.execute(stmt_out)
-        outlier_recs = out_result.scalars().all()
-        outliersX = [
-            rec.time.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
-            for rec in outlier_recs
-        ]
-
-        return DataWithOutliers(data=data, outliersX=outliersX)
 
+    try:
+        return await get_sync_state(session, email)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Ошибка при выборке данных: {e}",
+            detail=f"Ошибка при выборке состояния синхронизации: {e}",
         )
 
 
@@ -424,15 +361,21 @@ async def get_processed_data_with_outliers(
     summary="Получить ML-прогнозы последней итерации",
 )
 async def get_predictions(
+    request: Request,
+    response: Response,
     token=Depends(security),
     user_data=Depends(get_current_user),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
 ) -> List[Prediction]:
     """
     Возвращает список прогнозов из таблицы ml_predictions_records
-    для текущего пользователя, взятых из последней итерации:
+    для текущего пользователя, взятых из последней завершённой итерации
+    (latest_iterations при LATEST_ITERATIONS_ENABLED, иначе или без строки
+    там — max(iteration_num) по истории):
       - diagnosisName: название диагноза
       - result: вероятность (строка)
+    ETag и Last-Modified строятся по номеру и времени последней итерации:
+    If-None-Match / If-Modified-Since без новой итерации получают 304.
     """
     email = user_data.email
     if not email:
@@ -441,18 +384,33 @@ async def get_predictions(
         )
 
     try:
-        subq = (
-            select(func.max(MLPredictionsRecords.iteration_num))
-            .where(MLPredictionsRecords.email == email)
-            .scalar_subquery()
-        )
-
-        stmt = select(MLPredictionsRecords).where(
+        latest = None
+        if settings.LATEST_ITERATIONS_ENABLED:
+            latest = (
+                await session.execute(
+                    latest_iteration_select(email, IterationKind.ML_PREDICTIONS)
+                )
+            ).one_or_none()
+            LATEST_ITERATION_LOOKUPS.labels(
+                kind=IterationKind.ML_PREDICTIONS.value,
+                result="miss" if latest is None else "hit",
+            ).inc()
+        if latest is None:
+            latest = (await session.execute(ml_predictions_history_select(email))).one()
+        iteration_num, iteration_datetime = latest
+        etag = make_etag("predictions", email, iteration_num)
+        if is_not_modified(request, etag, iteration_datetime):
+            return not_modified(etag, iteration_datetime)
+        response.headers.update(validator_headers(etag, iteration_datetime))
+
+        stmt = select(
+            MLPredictionsRecords.diagnosis_name, MLPredictionsRecords.result_value
+        ).where(
             (MLPredictionsRecords.email == email)
-            & (MLPredictionsRecords.iteration_num == subq)
+            & (MLPredictionsRecords.iteration_num == iteration_num)
         )
         recs_result = await session.execute(stmt)
-        recs = recs_result.scalars().all()
+        recs = recs_result.all()
 
         return [
             Prediction(diagnosisName=rec.diagnosis_name, result=rec.result_value)
@@ -483,7 +441,7 @@ async def get_fhir_all_data_manual(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Email не передан"
         )
 
-    session: AsyncSession = db_engine.create_session()
+    session: AsyncSession = db_engine.create_read_session()
 
     async def bundle_generator():
         yield '{"resourceType":"Bundle","type":"collection","entry":['
@@ -493,13 +451,13 @@ async def get_fhir_all_data_manual(
 
         while True:
             stmt = (
-                select(RawRecords)
+                raw_records_rows_select()
                 .where((RawRecords.email == email) & (RawRecords.id > last_id))
                 .order_by(RawRecords.id)
                 .limit(settings.BATCH_SIZE)
             )
             result = await session.execute(stmt)
-            batch = result.scalars().all()
+            batch = result.all()
 
             if not batch:
                 break
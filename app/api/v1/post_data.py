@@ -1,87 +1,346 @@
+import asyncio
 import json
 import logging
 import datetime
-from typing import List
+from typing import List, Tuple
 
-from fastapi import APIRouter, HTTPException, status, BackgroundTasks, Depends
+from fastapi import APIRouter, HTTPException, status, BackgroundTasks, Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.services.admission import AdmissionRoute, ingest_budget
+from app.services.db.db_session import get_session
+from app.services.dedup import ingest_dedup
+from app.services.ingest_status import (
+    DeliveryTracker,
+    get_ingest_status,
+    save_ingest_status,
+)
+from app.services.iterations import complete_iteration
 from app.services.kafka import kafka_client
-from app.services.auth import get_current_user
+from app.services.series_cache import series_cache
+from app.services.sync_state import invalidate_sync_state
+from app.services.streaming import (
+    DecompressingRoute,
+    StreamParseError,
+    iter_request_items,
+)
+from app.services.auth import get_current_user, verify_service_token
 from app.services.redisClient import redis_client_async
-from app.models.models import DataType, KafkaRawDataMsg, ProgressPayload
+from app.models.models import (
+    DataType,
+    IngestResult,
+    IterationCompletedPayload,
+    IterationKind,
+    KafkaRawDataMsg,
+    ProgressPayload,
+    TokenData,
+)
 from app.settings import settings, security
 
 
-api_v2_post_data_router = APIRouter(prefix="/post_data", tags=["post_data"])
+api_v2_post_data_router = APIRouter(
+    prefix="/post_data", tags=["post_data"], route_class=DecompressingRoute
+)
+# Роуты с телом List[dict]: бюджет и размер тела проверяются до разбора JSON.
+# Подключается к api_v2_post_data_router в конце модуля
+_raw_data_router = APIRouter(route_class=AdmissionRoute)
 
+_DATA_TYPES = {data_type.value for data_type in DataType}
 
-@api_v2_post_data_router.post(
+
+async def _admit_raw_data(
+    data: List[dict], data_type: DataType, user_data: TokenData, nbytes: int
+) -> Tuple[List[int], List[str]]:
+    """
+    Отбрасывает уже присланные элементы (ingest_dedup) и резервирует место
+    в ingest_budget под оставшиеся. Возвращает индексы новых элементов в `data`
+    и их хеши. Исчерпанный бюджет и слишком большое тело отклоняются ещё
+    до чтения тела (AdmissionRoute).
+    """
+    kept, hashes = await ingest_dedup.check(user_data.email, data_type.value, data)
+    ingest_budget.acquire(len(kept), nbytes)
+    return kept, hashes
+
+
+async def _send_raw_data(
+    msgs: List[dict],
+    user_data: TokenData,
+    data_type: DataType,
+    nbytes: int,
+    hashes: List[str],
+) -> List[Tuple[int, asyncio.Future]]:
+    """
+    Отправка сообщений пользователя в Kafka; бюджет ingest_budget,
+    занятый запросом, освобождается после доставки батчей, а элементы
+    дошедших батчей помечаются в ingest_dedup.
+    """
+    try:
+        sent = await kafka_client.send_many(
+            settings.RAW_DATA_KAFKA_TOPIC_NAME,
+            msgs,
+            key=kafka_client.user_key(user_data),
+            headers=kafka_client.user_headers(user_data),
+        )
+    except Exception:
+        ingest_budget.release(len(msgs), nbytes)
+        raise
+    await asyncio.gather(
+        ingest_budget.release_after(sent, len(msgs), nbytes),
+        ingest_dedup.commit_delivered(
+            user_data.email, data_type.value, sent, hashes
+        ),
+    )
+    return sent
+
+
+async def _send_raw_data_acked(
+    data: List[dict],
+    msgs: List[dict],
+    user_data: TokenData,
+    data_type: DataType,
+    nbytes: int,
+    kept: List[int],
+    hashes: List[str],
+) -> IngestResult:
+    """
+    Режим ack: дожидается доставки всех батчей и возвращает ingestId
+    с числом принятых Kafka / записанных в спул / не доставленных /
+    повторных элементов; результат
+    сохраняется в Redis для GET /post_data/ingest_status/{ingest_id}.
+    """
+    tracker = DeliveryTracker()
+    tracker.duplicates = len(data) - len(kept)
+    try:
+        sent = await _send_raw_data(msgs, user_data, data_type, nbytes, hashes)
+    except Exception as e:
+        logging.error(f"Error sending Kafka messages: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error sending Kafka messages",
+        )
+    tracker.add(sent, kept)
+    result = await tracker.result(data_type.value)
+    await save_ingest_status(user_data.email, result)
+    return result
+
+
+@_raw_data_router.post(
     "/raw_data/{data_type}",
     status_code=status.HTTP_200_OK,
     summary="Send Google Health data to Kafka and track progress in Redis",
 )
 async def send_google_health_connect_data_kafka(
+    request: Request,
     data: List[dict],
     data_type: DataType,
     background_tasks: BackgroundTasks,
+    ack: bool = False,
     token=Depends(security),
     user_data=Depends(get_current_user),
 ):
     """
     Получает список сырых данных `data` от клиента и:
-      1. Для каждого элемента планирует отправку в Kafka в фоне.
-      2. Обновляет запись в Redis по email пользователя,
-         если `sent_at` текущего запроса новее сохранённого.
+      1. Отбрасывает элементы, уже присланные ранее (ingest_dedup).
+      2. Резервирует место в общем бюджете ingest_budget
+         (503 + Retry-After, если он исчерпан).
+      3. Планирует пакетную отправку новых элементов в Kafka в фоне
+         (одна фоновая задача на запрос, см. KafkaClient.send_many).
+         С `ack=true` дожидается доставки и возвращает IngestResult.
     """
+    nbytes = len(await request.body())
+    kept, hashes = await _admit_raw_data(data, data_type, user_data, nbytes)
     try:
-        logging.info(f"got this datatype {data_type}: {data}")
-        email = user_data.email
+        logging.info(
+            f"got {len(data)} items of datatype {data_type}, {len(kept)} new"
+        )
 
-        for item in data:
-            msg = KafkaRawDataMsg(
-                rawData=item, dataType=data_type, userData=user_data
+        msgs = [
+            KafkaRawDataMsg(
+                rawData=data[i], dataType=data_type, userData=user_data
             ).model_dump()
-
-            background_tasks.add_task(
-                kafka_client.send, settings.RAW_DATA_KAFKA_TOPIC_NAME, msg
-            )
-
-        return {"status": "ok"}
+            for i in kept
+        ]
 
     except Exception as e:
+        ingest_budget.release(len(kept), nbytes)
         logging.error(f"Error scheduling Kafka messages: {e}", exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error scheduling Kafka messages",
         )
 
+    if ack:
+        return await _send_raw_data_acked(
+            data, msgs, user_data, data_type, nbytes, kept, hashes
+        )
 
-@api_v2_post_data_router.post(
+    background_tasks.add_task(
+        _send_raw_data, msgs, user_data, data_type, nbytes, hashes
+    )
+    return {"status": "ok"}
+
+
+@_raw_data_router.post(
     "/raw_data_google_fitness_api/{data_type}", status_code=status.HTTP_200_OK
 )
 async def send_google_fitness_api_data_to_kafka(
+    request: Request,
     data: List[dict],
     data_type: DataType,
     background_tasks: BackgroundTasks,
+    ack: bool = False,
     token=Depends(security),
     user_data=Depends(get_current_user),
 ):
+    nbytes = len(await request.body())
+    kept, hashes = await _admit_raw_data(data, data_type, user_data, nbytes)
     try:
-        for item in data:
-            data_to_send = KafkaRawDataMsg(
-                rawData=item, dataType=data_type, userData=user_data
-            )
-            background_tasks.add_task(
-                kafka_client.send,
-                settings.RAW_DATA_KAFKA_TOPIC_NAME,
-                data_to_send.model_dump(),
-            )
-        return {"status": "ok"}
+        msgs = [
+            KafkaRawDataMsg(
+                rawData=data[i], dataType=data_type, userData=user_data
+            ).model_dump()
+            for i in kept
+        ]
     except Exception as e:
+        ingest_budget.release(len(kept), nbytes)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error scheduling Kafka messages: {str(e)}",
         )
 
+    if ack:
+        return await _send_raw_data_acked(
+            data, msgs, user_data, data_type, nbytes, kept, hashes
+        )
+
+    background_tasks.add_task(
+        _send_raw_data, msgs, user_data, data_type, nbytes, hashes
+    )
+    return {"status": "ok"}
+
+
+@api_v2_post_data_router.post(
+    "/raw_data_stream/{data_type}",
+    status_code=status.HTTP_200_OK,
+    summary="Потоковая отправка сырых данных (NDJSON или JSON-массив) в Kafka",
+)
+async def stream_raw_data_to_kafka(
+    request: Request,
+    data_type: DataType,
+    ack: bool = False,
+    token=Depends(security),
+    user_data=Depends(get_current_user),
+):
+    """
+    Читает тело запроса потоково (`application/x-ndjson` или JSON-массив,
+    при необходимости сжатое gzip/zstd — см. Content-Encoding) и отправляет
+    элементы в Kafka пачками по INGEST_STREAM_CHUNK_SIZE по мере разбора,
+    не загружая всю выгрузку в память.
+    С `ack=true` в конце дожидается доставки и возвращает IngestResult.
+    """
+    sent = 0
+    seen = 0
+    chunk = []
+    chunk_start = 0
+    key = kafka_client.user_key(user_data)
+    headers = kafka_client.user_headers(user_data)
+    tracker = DeliveryTracker() if ack else None
+    # Хеши, уже принятые в этом запросе: их отметки в ingest_dedup
+    # появятся только после доставки
+    pending_hashes = set()
+
+    async def flush():
+        # Каждая пачка проходит дедупликацию и занимает место
+        # в ingest_budget до доставки в Kafka
+        nonlocal sent, seen, chunk, chunk_start
+        nbytes = request.bytes_read - chunk_start
+        kept, hashes = await ingest_dedup.check(
+            user_data.email, data_type.value, chunk, pending_hashes
+        )
+        ingest_budget.acquire(len(kept), nbytes)
+        msgs = [
+            KafkaRawDataMsg(
+                rawData=chunk[i], dataType=data_type, userData=user_data
+            ).model_dump()
+            for i in kept
+        ]
+        try:
+            batches = await kafka_client.send_many(
+                settings.RAW_DATA_KAFKA_TOPIC_NAME, msgs, key=key, headers=headers
+            )
+        except Exception:
+            ingest_budget.release(len(kept), nbytes)
+            raise
+        ingest_budget.release_when_delivered(batches, len(kept), nbytes)
+        ingest_dedup.commit_when_delivered(
+            user_data.email, data_type.value, batches, hashes
+        )
+        if tracker is not None:
+            tracker.add(batches, [seen + i for i in kept])
+            tracker.duplicates += len(chunk) - len(kept)
+        sent += len(kept)
+        seen += len(chunk)
+        chunk = []
+        chunk_start = request.bytes_read
+
+    ingest_budget.check_available()
+    try:
+        async for item in iter_request_items(request):
+            chunk.append(item)
+            if len(chunk) >= settings.INGEST_STREAM_CHUNK_SIZE:
+                await flush()
+
+        if chunk:
+            await flush()
+
+        if tracker is not None:
+            result = await tracker.result(data_type.value)
+            await save_ingest_status(user_data.email, result)
+            return result
+
+        return {"status": "ok", "count": sent, "duplicates": seen - sent}
+
+    except StreamParseError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid body after {seen} items: {e}",
+        )
+    except HTTPException as e:
+        if e.status_code == status.HTTP_503_SERVICE_UNAVAILABLE:
+            e.detail = f"{e.detail}; {seen} items were accepted before"
+        raise
+    except Exception as e:
+        logging.error(f"Error streaming Kafka messages: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error streaming Kafka messages after {seen} items",
+        )
+
+
+@api_v2_post_data_router.get(
+    "/ingest_status/{ingest_id}",
+    response_model=IngestResult,
+    status_code=status.HTTP_200_OK,
+    summary="Результат выгрузки, отправленной с ack=true",
+)
+async def get_ingest_status_by_id(
+    ingest_id: str,
+    token=Depends(security),
+    user_data=Depends(get_current_user),
+) -> IngestResult:
+    """
+    Возвращает число принятых Kafka, записанных в спул (spooledRanges — они
+    дойдут до Kafka при воспроизведении спула) и не доставленных элементов
+    выгрузки и диапазоны индексов failedRanges, которые клиенту стоит
+    отправить повторно.
+    """
+    result = await get_ingest_status(user_data.email, ingest_id)
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Ingest not found or expired",
+        )
+    return result
+
 
 @api_v2_post_data_router.post(
     "/progress",
@@ -111,6 +370,10 @@ async def update_progress_async(
         }
 
         await redis_client_async.set(redis_key, json.dumps(record))
+        # Сервис обработки дописал raw_records — watermark пользователя
+        # и закешированные ряды устарели
+        await invalidate_sync_state(payload.email)
+        await series_cache.invalidate(payload.email)
 
         return {"status": "progress updated", "record": record}
 
@@ -119,3 +382,50 @@ async def update_progress_async(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Cannot update progress: {e}",
         )
+
+
+@api_v2_post_data_router.post(
+    "/iteration_completed",
+    status_code=status.HTTP_200_OK,
+    summary="Отметить итерацию поиска выбросов / ML-прогнозов завершённой",
+    dependencies=[Depends(verify_service_token)],
+)
+async def complete_iteration_async(
+    payload: IterationCompletedPayload,
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Вызывается сервисом обработки (Bearer PROCESSING_SERVICE_TOKEN), когда
+    итерация полностью записана. Переводит указатель latest_iterations,
+    по которому читают /get_data/*_with_outliers и /get_data/predictions,
+    на эту итерацию.
+    """
+    if payload.kind == IterationKind.ML_PREDICTIONS:
+        if payload.dataType:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="dataType must be empty for ml_predictions",
+            )
+    elif payload.dataType not in _DATA_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown or empty dataType for {payload.kind.value}",
+        )
+    try:
+        updated = await complete_iteration(
+            session,
+            payload.email,
+            payload.kind,
+            payload.dataType,
+            payload.iterationNum,
+            payload.completedAt,
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Cannot complete iteration: {e}",
+        )
+    return {"status": "iteration completed" if updated else "iteration is stale"}
+
+
+api_v2_post_data_router.include_router(_raw_data_router)
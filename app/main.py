@@ -18,6 +18,8 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 from app.settings import google_fitness_api_user_clients, google_health_api_user_clients
 from app.services.redisClient import redis_client_async
+from app.services.httpClient import http_client_async
+from app.services.jwks import jwks_client
 
 from app.services.utils import PrometheusMiddleware, metrics, setting_otlp
 
@@ -88,12 +90,17 @@ async def startup_event():
 
     await kafka_client.connect()
     await redis_client_async.connect()
+    await http_client_async.connect()
+    if settings.AUTH_MODE == "jwt":
+        await jwks_client.connect()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await jwks_client.disconnect()
     await kafka_client.disconnect()
     await redis_client_async.disconnect()
+    await http_client_async.disconnect()
 
 
 if settings.BACKEND_CORS_ORIGINS:
@@ -103,6 +110,7 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor"],
     )
 
 
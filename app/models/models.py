@@ -1,6 +1,7 @@
 from pydantic import BaseModel
 from enum import Enum
 from typing import List
+from datetime import datetime
 
 
 class DataItem(BaseModel):
@@ -46,6 +47,31 @@ class DataType(str, Enum):
     STEP_CADENCE_RECORD = "StepCadenceRecord"
 
 
+class SeriesSource(str, Enum):
+    RAW = "raw"
+    PROCESSED = "processed"
+
+
+class IterationKind(str, Enum):
+    RAW_OUTLIERS = "raw_outliers"
+    PROCESSED_OUTLIERS = "processed_outliers"
+    ML_PREDICTIONS = "ml_predictions"
+
+
+class AggregateBucket(str, Enum):
+    FIVE_MINUTES = "5m"
+    HOUR = "1h"
+    DAY = "1d"
+
+
+class AggregateFunction(str, Enum):
+    AVG = "avg"
+    MIN = "min"
+    MAX = "max"
+    SUM = "sum"
+    COUNT = "count"
+
+
 class TokenData(BaseModel):
     google_sub: str
     email: str
@@ -54,6 +80,9 @@ class TokenData(BaseModel):
 
 
 class KafkaRawDataMsg(BaseModel):
+    # Пользователь передаётся также ключом и заголовками записи Kafka
+    # (KafkaClient.user_key / KafkaClient.user_headers); в значении userData
+    # остаётся только в схеме версии 1, см. KAFKA_VALUE_SCHEMA_VERSION
     rawData: dict | List[dict]
     dataType: str
     userData: TokenData
@@ -69,11 +98,42 @@ class DataWithOutliers(BaseModel):
     outliersX: List[str]
 
 
+class SyncStateItem(BaseModel):
+    dataType: str
+    # Время последней записи этого типа на сервере, в формате DataRecord.X
+    lastX: str
+    count: int
+
+
 class Prediction(BaseModel):
     result: str
     diagnosisName: str
 
 
+class IngestResult(BaseModel):
+    ingestId: str
+    dataType: str
+    accepted: int
+    failed: int
+    # Элементы, отброшенные как уже присланные ранее
+    duplicates: int = 0
+    # Полуинтервалы [start, end) индексов элементов выгрузки, не доставленных в Kafka
+    failedRanges: List[List[int]]
+    # Элементы, которые Kafka не приняла и которые записаны в дисковый спул:
+    # в Kafka они попадут при воспроизведении спула, повторять их не нужно
+    spooled: int = 0
+    spooledRanges: List[List[int]] = []
+
+
 class ProgressPayload(BaseModel):
     progress: str
     email: str
+
+
+class IterationCompletedPayload(BaseModel):
+    email: str
+    kind: IterationKind
+    # Для ml_predictions не указывается
+    dataType: str = ""
+    iterationNum: int
+    completedAt: datetime | None = None
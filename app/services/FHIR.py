@@ -339,10 +339,9 @@ class FHIRTransformer:
                 ],
                 "text": cmap["display"],
             }
-            try:
-                val = float(rec.value)
-            except Exception:
-                val = None
+            # value_num — value, разобранный в double precision при записи
+            # (NULL для нечисловых значений)
+            val = rec.value_num
 
             if val is not None:
                 base["valueQuantity"] = {
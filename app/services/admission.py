@@ -0,0 +1,123 @@
+import asyncio
+import logging
+from typing import List, Tuple
+
+from fastapi import HTTPException, status
+from starlette.requests import Request
+
+from app.services.streaming import DecompressingRoute
+from app.services.utils import (
+    INGEST_INFLIGHT_BYTES,
+    INGEST_INFLIGHT_MESSAGES,
+    INGEST_REJECTED,
+)
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class IngestBudget:
+    """
+    Общий для всех ingestion-роутов бюджет «в полёте»: сообщения и байты,
+    принятые от клиентов, но ещё не доставленные в Kafka (или в спул).
+    Когда бюджет исчерпан, запрос отклоняется с 503 и Retry-After
+    вместо того, чтобы копить неотправленные данные в памяти процесса.
+    """
+
+    def __init__(self, max_messages: int, max_bytes: int):
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.messages = 0
+        self.bytes = 0
+        self._tasks = set()
+
+    def check_available(self):
+        """Отклоняет запрос сразу, если бюджет уже исчерпан (до чтения тела)."""
+        if self.messages >= self.max_messages or self.bytes >= self.max_bytes:
+            raise self._exhausted()
+
+    def acquire(self, messages: int, nbytes: int):
+        if messages > self.max_messages or nbytes > self.max_bytes:
+            raise self.too_large()
+        if (
+            self.messages + messages > self.max_messages
+            or self.bytes + nbytes > self.max_bytes
+        ):
+            raise self._exhausted()
+        self.messages += messages
+        self.bytes += nbytes
+        self._update_metrics()
+
+    def release(self, messages: int, nbytes: int):
+        self.messages -= messages
+        self.bytes -= nbytes
+        self._update_metrics()
+
+    async def release_after(
+        self, sent: List[Tuple[int, asyncio.Future]], messages: int, nbytes: int
+    ):
+        """Освобождает бюджет, когда все батчи доставлены (или упали)."""
+        try:
+            results = await asyncio.gather(
+                *(future for _, future in sent), return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.error(f"Батч не доставлен в Kafka: {result!r}")
+        finally:
+            self.release(messages, nbytes)
+
+    def release_when_delivered(
+        self, sent: List[Tuple[int, asyncio.Future]], messages: int, nbytes: int
+    ):
+        """То же, что release_after, но не блокируя вызывающего (для потоковой загрузки)."""
+        task = asyncio.create_task(self.release_after(sent, messages, nbytes))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    def too_large() -> HTTPException:
+        INGEST_REJECTED.labels(reason="too_large").inc()
+        return HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="Upload exceeds ingest budget, use /post_data/raw_data_stream",
+        )
+
+    @staticmethod
+    def _exhausted() -> HTTPException:
+        INGEST_REJECTED.labels(reason="budget_exhausted").inc()
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Ingest budget exhausted, retry later",
+            headers={"Retry-After": str(settings.INGEST_RETRY_AFTER_SECONDS)},
+        )
+
+    def _update_metrics(self):
+        INGEST_INFLIGHT_MESSAGES.set(self.messages)
+        INGEST_INFLIGHT_BYTES.set(self.bytes)
+
+
+ingest_budget = IngestBudget(
+    max_messages=settings.INGEST_MAX_INFLIGHT_MESSAGES,
+    max_bytes=settings.INGEST_MAX_INFLIGHT_BYTES,
+)
+
+
+class AdmissionRoute(DecompressingRoute):
+    """
+    Роут ingestion-хэндлеров с телом List[dict]. FastAPI читает и разбирает
+    тело до зависимостей и самого хэндлера, поэтому исчерпанный бюджет
+    и тело больше всего бюджета (по Content-Length или по мере распаковки)
+    отклоняются здесь, не дожидаясь разбора JSON.
+    """
+
+    max_body_bytes = ingest_budget.max_bytes
+
+    def admit(self, request: Request):
+        ingest_budget.check_available()
+        content_length = request.headers.get("content-length", "")
+        if content_length.isdigit() and int(content_length) > self.max_body_bytes:
+            raise ingest_budget.too_large()
+
+    def body_too_large(self) -> HTTPException:
+        return ingest_budget.too_large()
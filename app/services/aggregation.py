@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import DateTime, Interval, Select, cast, func, literal, select
+
+from app.models.models import AggregateBucket, AggregateFunction, SeriesSource
+from app.services.db.queries import SOURCES
+
+BUCKET_WIDTHS = {
+    AggregateBucket.FIVE_MINUTES: timedelta(minutes=5),
+    AggregateBucket.HOUR: timedelta(hours=1),
+    AggregateBucket.DAY: timedelta(days=1),
+}
+
+AGGREGATES = {
+    AggregateFunction.AVG: func.avg,
+    AggregateFunction.MIN: func.min,
+    AggregateFunction.MAX: func.max,
+    AggregateFunction.SUM: func.sum,
+}
+
+# Корзины выравниваются по UTC
+BUCKET_ORIGIN = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def aggregate_stmt(
+    source: SeriesSource,
+    email: str,
+    data_type: str,
+    bucket: AggregateBucket,
+    agg: AggregateFunction,
+    from_: datetime | None,
+    to: datetime | None,
+    limit: int,
+) -> Select:
+    """
+    Агрегат ряда пользователя по корзинам времени, посчитанный в Postgres
+    (date_bin): из БД уходит одна строка (начало корзины, значение) на корзину.
+    count — число всех записей корзины, остальные агрегаты — по value_num
+    только среди записей с числовым value.
+    """
+    model = SOURCES[source]
+    bucket_start = func.date_bin(
+        cast(literal(BUCKET_WIDTHS[bucket]), Interval),
+        model.time,
+        cast(literal(BUCKET_ORIGIN), DateTime(timezone=True)),
+    ).label("bucket")
+    stmt = select(bucket_start).where(
+        (model.data_type == data_type) & (model.email == email)
+    )
+    if agg == AggregateFunction.COUNT:
+        stmt = stmt.add_columns(func.count().label("value"))
+    else:
+        stmt = stmt.add_columns(
+            AGGREGATES[agg](model.value_num).label("value")
+        ).where(model.value_num.is_not(None))
+    if from_ is not None:
+        stmt = stmt.where(model.time >= from_)
+    if to is not None:
+        stmt = stmt.where(model.time < to)
+    return stmt.group_by(bucket_start).order_by(bucket_start).limit(limit)
@@ -1,25 +1,134 @@
-from fastapi.security import OAuth2PasswordBearer
+import asyncio
+import secrets
+from typing import Dict
+
+from fastapi.security import (
+    HTTPAuthorizationCredentials,
+    HTTPBearer,
+    OAuth2PasswordBearer,
+)
 from fastapi import Depends, HTTPException, status
-from aiohttp import ClientSession
+from jose import JWTError
 from app.models.models import TokenData
+from app.services.httpClient import http_client_async
+from app.services.jwks import jwks_client
+from app.services.token_cache import token_cache
+from app.services.utils import (
+    AUTH_API_COALESCED,
+    AUTH_API_REQUESTS,
+    AUTH_JWT_VERIFICATIONS,
+)
 from app.settings import settings
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+service_scheme = HTTPBearer(auto_error=False)
+
+# token -> запрос в auth-сервис, который уже выполняется
+_inflight: Dict[str, asyncio.Task] = {}
+
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
 
 
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> TokenData:
+    """
+    Проверяет токен в auth-сервисе; результат (в т.ч. отказ)
+    кешируется в token_cache, так что повторные запросы сессии
+    в auth-сервис не ходят. Одновременные запросы с одним токеном
+    ждут один и тот же запрос в auth-сервис.
+
+    При AUTH_MODE=jwt токен проверяется локально по JWKS, а в auth-сервис
+    идём, только если в токене нет полей TokenData (или ключи недоступны).
+    """
+    found, user = await token_cache.get(token)
+    if found:
+        if user is None:
+            raise _credentials_exception()
+        return user
+
+    if settings.AUTH_MODE == "jwt" and jwks_client.ready:
+        user = await _verify_locally(token)
+        if user is not None:
+            return user
+
+    task = _inflight.get(token)
+    if task is None:
+        task = asyncio.ensure_future(_fetch_user(token))
+        _inflight[token] = task
+        task.add_done_callback(lambda t: _finish_fetch(token, t))
+    else:
+        AUTH_API_COALESCED.inc()
+    # shield: отмена одного клиента не должна отменять запрос остальным
+    return await asyncio.shield(task)
+
+
+async def verify_service_token(
+    credentials: HTTPAuthorizationCredentials | None = Depends(service_scheme),
+):
+    """
+    Доступ к внутренним эндпоинтам, которые вызывает сервис обработки:
+    Bearer-токен должен совпадать с PROCESSING_SERVICE_TOKEN.
+    Пока токен не задан, такие эндпоинты закрыты.
+    """
+    expected = settings.PROCESSING_SERVICE_TOKEN
+    if not expected:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="PROCESSING_SERVICE_TOKEN is not configured",
+        )
+    if credentials is None or not secrets.compare_digest(
+        credentials.credentials.encode("utf-8"), expected.encode("utf-8")
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid service token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+async def _verify_locally(token: str) -> TokenData | None:
+    try:
+        user = await jwks_client.verify(token)
+    except JWTError:
+        AUTH_JWT_VERIFICATIONS.labels(result="invalid").inc()
+        await token_cache.put(token, None)
+        raise _credentials_exception()
+    if user is None:
+        AUTH_JWT_VERIFICATIONS.labels(result="fallback").inc()
+        return None
+    AUTH_JWT_VERIFICATIONS.labels(result="valid").inc()
+    await token_cache.put(token, user)
+    return user
+
+
+def _finish_fetch(token: str, task: asyncio.Task):
+    _inflight.pop(token, None)
+    if not task.cancelled():
+        # Помечаем исключение полученным, даже если все ожидающие отменились
+        task.exception()
+
+
+async def _fetch_user(token: str) -> TokenData:
     headers = {"Authorization": f"Bearer {token}", "accept": "application/json"}
     url = f"{settings.AUTH_API_URL}{settings.AUTH_API_USER_INFO_PATH}"
 
-    async with ClientSession() as session:
-        async with session.get(url, headers=headers) as response:
-            if response.status != 200:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Could not validate credentials",
-                    headers={"WWW-Authenticate": "Bearer"},
-                )
-            data = await response.json()
+    async with http_client_async.get(url, headers=headers) as response:
+        AUTH_API_REQUESTS.labels(status=str(response.status)).inc()
+        if response.status != 200:
+            # Кешируем только явный отказ, а не сбои auth-сервиса
+            if response.status in (
+                status.HTTP_401_UNAUTHORIZED,
+                status.HTTP_403_FORBIDDEN,
+            ):
+                await token_cache.put(token, None)
+            raise _credentials_exception()
+        data = await response.json()
 
     user = TokenData.parse_obj(data)
+    await token_cache.put(token, user)
     return user
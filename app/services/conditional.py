@@ -0,0 +1,63 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict
+
+from fastapi import Request, Response, status
+
+
+def make_etag(*watermark: Any) -> str:
+    """
+    Слабый ETag по watermark данных (max(id), номер итерации, параметры
+    запроса ...): меняется вместе с данными, но считается без самого ряда.
+    """
+    digest = hashlib.blake2b(repr(watermark).encode("utf-8"), digest_size=12)
+    return f'W/"{digest.hexdigest()}"'
+
+
+def http_date(value: datetime) -> str:
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def validator_headers(etag: str, last_modified: datetime | None = None) -> Dict[str, str]:
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def is_not_modified(
+    request: Request, etag: str, last_modified: datetime | None = None
+) -> bool:
+    """
+    Проверяет If-None-Match (слабое сравнение) и, если его нет,
+    If-Modified-Since — как в RFC 9110, 13.2.2.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        tag = etag.removeprefix("W/")
+        return any(
+            candidate.strip().removeprefix("W/") == tag
+            for candidate in if_none_match.split(",")
+        )
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # Last-Modified передаётся с точностью до секунды
+    return last_modified.replace(microsecond=0) <= since
+
+
+def not_modified(etag: str, last_modified: datetime | None = None) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers=validator_headers(etag, last_modified),
+    )
@@ -12,3 +12,13 @@ async def get_session():
 
     async with db_engine.create_session() as session:
         yield session
+
+
+async def get_read_session():
+    """
+    То же, что get_session, но сессия только для чтения (см.
+    AsyncDbEngine.create_read_session) — для GET-роутов.
+    """
+
+    async with db_engine.create_read_session() as session:
+        yield session
@@ -31,6 +31,14 @@ class AsyncDbEngine:
             class_=AsyncSession,
             expire_on_commit=False,
         )
+        # Сессии для GET-роутов: транзакции READ ONLY, без autoflush;
+        # пул соединений общий с основным движком
+        self._read_session_factory = sessionmaker(
+            bind=self.engine.execution_options(postgresql_readonly=True),
+            class_=AsyncSession,
+            expire_on_commit=False,
+            autoflush=False,
+        )
 
     def create_session(self) -> AsyncSession:
         """
@@ -41,6 +49,14 @@ class AsyncDbEngine:
         """
         return self._session_factory()
 
+    def create_read_session(self) -> AsyncSession:
+        """
+        Возвращает AsyncSession только для чтения. Запросы через неё
+        должны выбирать колонки (select(Model.col, ...)), а не сущности,
+        чтобы не тратить время на identity map.
+        """
+        return self._read_session_factory()
+
     async def request(
         self,
         db_request: Union[str, Any],
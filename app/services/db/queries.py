@@ -0,0 +1,139 @@
+from sqlalchemy import Select, func, literal, select
+
+from app.models.models import IterationKind, SeriesSource
+from app.services.db.schemas import (
+    LatestIterations,
+    MLPredictionsRecords,
+    OutliersRecords,
+    ProcessedRecords,
+    ProcessedRecordsOutliersRecords,
+    RawRecords,
+)
+
+SOURCES = {
+    SeriesSource.RAW: RawRecords,
+    SeriesSource.PROCESSED: ProcessedRecords,
+}
+
+# Таблица выбросов ряда, её ссылка на точку ряда и вид итерации
+OUTLIERS = {
+    RawRecords: (
+        OutliersRecords,
+        OutliersRecords.raw_record_id,
+        IterationKind.RAW_OUTLIERS,
+    ),
+    ProcessedRecords: (
+        ProcessedRecordsOutliersRecords,
+        ProcessedRecordsOutliersRecords.processed_record_id,
+        IterationKind.PROCESSED_OUTLIERS,
+    ),
+}
+
+
+def series_select(model, email: str, data_type: str) -> Select:
+    """
+    Точки ряда пользователя (id, time, value_num) лёгкими Row-кортежами,
+    без загрузки ORM-объектов целиком (email, data_type не нужны сериализаторам).
+    Записи с нечисловым value (value_num IS NULL) в ряд не попадают.
+    """
+    return select(model.id, model.time, model.value_num).where(
+        (model.data_type == data_type)
+        & (model.email == email)
+        & model.value_num.is_not(None)
+    )
+
+
+def latest_iteration_select(
+    email: str, kind: IterationKind, data_type: str = ""
+) -> Select:
+    """(iteration_num, completed_at) последней завершённой итерации — по PK."""
+    return select(LatestIterations.iteration_num, LatestIterations.completed_at).where(
+        (LatestIterations.email == email)
+        & (LatestIterations.kind == kind.value)
+        & (LatestIterations.data_type == data_type)
+    )
+
+
+def _history_iteration_column(model):
+    """Итерация выбросов точки: поиск по индексу (record_id, iteration)."""
+    outliers, record_id, _ = OUTLIERS[model]
+    return (
+        select(func.max(outliers.outliers_search_iteration_num))
+        .where(record_id == model.id)
+        .scalar_subquery()
+    )
+
+
+def series_outliers_watermark_select(
+    model, email: str, data_type: str, latest_pointer: bool = True
+) -> Select:
+    """
+    (max(id), count) ряда и номер последней итерации выбросов одним запросом.
+    latest_pointer=True — итерация из latest_iterations (поиск по PK,
+    NULL без строки); иначе — max() по истории в том же проходе по ряду,
+    т.е. поиск по индексу таблицы выбросов на каждую точку.
+    """
+    _, _, kind = OUTLIERS[model]
+    if latest_pointer:
+        last_iteration = (
+            latest_iteration_select(email, kind, data_type)
+            .with_only_columns(LatestIterations.iteration_num)
+            .scalar_subquery()
+        )
+    else:
+        last_iteration = func.max(_history_iteration_column(model))
+    return select(func.max(model.id), func.count(), last_iteration).where(
+        (model.data_type == data_type) & (model.email == email)
+    )
+
+
+def series_outliers_history_iteration_select(
+    model, email: str, data_type: str
+) -> Select:
+    """
+    Номер последней итерации выбросов ряда по истории, без latest_iterations:
+    итерация каждой точки берётся из индекса (record_id, iteration).
+    """
+    return select(func.max(_history_iteration_column(model))).where(
+        (model.data_type == data_type) & (model.email == email)
+    )
+
+
+def ml_predictions_history_select(email: str) -> Select:
+    """(iteration_num, iteration_datetime) последней итерации прогнозов по истории."""
+    return select(
+        func.max(MLPredictionsRecords.iteration_num),
+        func.max(MLPredictionsRecords.iteration_datetime),
+    ).where(MLPredictionsRecords.email == email)
+
+
+def series_with_outliers_select(
+    model, email: str, data_type: str, iteration: int
+) -> Select:
+    """
+    series_select по времени с флагом is_outlier — является ли точка
+    выбросом в итерации `iteration`: ряд и выбросы одним запросом.
+    """
+    outliers, record_id, _ = OUTLIERS[model]
+    # OFFSET 0 не даёт планировщику заменить проверку хеш-таблицей по всем
+    # выбросам итерации (всех пользователей): проба индекса
+    # (record_id, iteration) на точку дешевле для ряда одного пользователя
+    is_outlier = (
+        select(literal(1))
+        .where(
+            (record_id == model.id)
+            & (outliers.outliers_search_iteration_num == iteration)
+        )
+        .offset(0)
+        .exists()
+    )
+    return (
+        series_select(model, email, data_type)
+        .add_columns(is_outlier.label("is_outlier"))
+        .order_by(model.time)
+    )
+
+
+def raw_records_rows_select() -> Select:
+    """Все колонки raw_records как Row (для FHIR-выгрузки)."""
+    return select(*RawRecords.__table__.columns)
@@ -1,6 +1,8 @@
 
 from sqlalchemy import (
     Column,
+    Double,
+    Index,
     Integer,
     String,
     DateTime,
@@ -15,12 +17,24 @@ Base = declarative_base()
 
 class RawRecords(Base):
     __tablename__ = "raw_records"
+    __table_args__ = (
+        # Основной предикат чтения: email = ? AND data_type = ? ORDER BY time
+        Index(
+            "ix_raw_records_email_data_type_time_num",
+            "email",
+            "data_type",
+            "time",
+            postgresql_include=["id", "value_num"],
+        ),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     data_type = Column(String, nullable=False)
-    email = Column(String, nullable=False, index=True)
-    time = Column(DateTime(timezone=True), nullable=False, index=True)
+    email = Column(String, nullable=False)
+    time = Column(DateTime(timezone=True), nullable=False)
     value = Column(Text, nullable=False)
+    # Заполняется триггером при записи; NULL, если value не число
+    value_num = Column(Double, nullable=True)
 
     def __repr__(self):
         return (
@@ -31,6 +45,14 @@ class RawRecords(Base):
 
 class OutliersRecords(Base):
     __tablename__ = "outliers_records"
+    __table_args__ = (
+        # Проверка «точка — выброс итерации N» и последняя итерация точки
+        Index(
+            "ix_outliers_records_raw_record_id_iteration",
+            "raw_record_id",
+            "outliers_search_iteration_num",
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     raw_record_id = Column(Integer, ForeignKey("raw_records.id"), nullable=False)
@@ -43,6 +65,11 @@ class OutliersRecords(Base):
 
 class MLPredictionsRecords(Base):
     __tablename__ = "ml_predictions_records"
+    __table_args__ = (
+        Index(
+            "ix_ml_predictions_records_email_iteration_num", "email", "iteration_num"
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, nullable=False)
@@ -56,16 +83,34 @@ class MLPredictionsRecords(Base):
 
 class ProcessedRecords(Base):
     __tablename__ = "processed_records"
+    __table_args__ = (
+        Index(
+            "ix_processed_records_email_data_type_time_num",
+            "email",
+            "data_type",
+            "time",
+            postgresql_include=["id", "value_num"],
+        ),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     data_type = Column(String, nullable=False)
-    email = Column(String, nullable=False, index=True)
-    time = Column(DateTime(timezone=True), nullable=False, index=True)
+    email = Column(String, nullable=False)
+    time = Column(DateTime(timezone=True), nullable=False)
     value = Column(Text, nullable=False)
+    # Заполняется триггером при записи; NULL, если value не число
+    value_num = Column(Double, nullable=True)
 
 
 class ProcessedRecordsOutliersRecords(Base):
     __tablename__ = "processed_records_outliers_records"
+    __table_args__ = (
+        Index(
+            "ix_processed_records_outliers_records_record_id_iteration",
+            "processed_record_id",
+            "outliers_search_iteration_num",
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     processed_record_id = Column(
@@ -78,3 +123,22 @@ class ProcessedRecordsOutliersRecords(Base):
     processed_records = relationship(
         "ProcessedRecords", backref="processed_records_outliers_records", uselist=False
     )
+
+
+class LatestIterations(Base):
+    """
+    Номер последней завершённой итерации поиска выбросов / ML-прогнозов
+    пользователя. Пишется сервисом обработки по завершении итерации
+    (POST /post_data/iteration_completed), при LATEST_ITERATIONS_ENABLED
+    читается вместо max() по истории.
+    """
+
+    __tablename__ = "latest_iterations"
+
+    email = Column(String, primary_key=True)
+    # IterationKind: raw_outliers | processed_outliers | ml_predictions
+    kind = Column(String, primary_key=True)
+    # Пустая строка для ml_predictions
+    data_type = Column(String, primary_key=True, server_default="")
+    iteration_num = Column(Integer, nullable=False)
+    completed_at = Column(DateTime(timezone=True), nullable=False)
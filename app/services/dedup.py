@@ -0,0 +1,148 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Dict, List, Sequence, Set, Tuple
+
+from app.services.redisClient import redis_client_async
+from app.services.utils import INGEST_DEDUP_ITEMS
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class IngestDeduplicator:
+    """
+    Отсекает элементы выгрузки, которые пользователь уже присылал:
+    мобильные клиенты при каждой синхронизации повторно отправляют
+    пересекающиеся окна данных Health Connect.
+
+    Хеши rawData хранятся в Redis-множествах на (email, dataType),
+    разбитых на поколения длиной INGEST_DEDUP_TTL_SECONDS: элемент считается
+    повтором, если он есть в текущем или предыдущем поколении. Так память
+    ограничена двумя окнами, а не всей историей пользователя.
+    Хеш попадает в множество только после доставки элемента в Kafka
+    или в спул (commit_delivered): элементы, потерянные при падении процесса,
+    клиент может прислать повторно.
+    При недоступности Redis элементы пропускаются без дедупликации.
+    """
+
+    def __init__(self, enabled: bool, ttl_seconds: int):
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self._tasks = set()
+
+    @staticmethod
+    def item_hash(item: Dict[str, Any]) -> str:
+        canonical = json.dumps(
+            item, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+        )
+        return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _keys(self, email: str, data_type: str) -> Tuple[str, str]:
+        generation = int(time.time() // self.ttl_seconds)
+        prefix = f"{settings.REDIS_INGEST_DEDUP_NAMESPACE}{email}-{data_type}-"
+        return f"{prefix}{generation}", f"{prefix}{generation - 1}"
+
+    async def check(
+        self,
+        email: str,
+        data_type: str,
+        items: Sequence[Dict[str, Any]],
+        pending: Set[str] | None = None,
+    ) -> Tuple[List[int], List[str]]:
+        """
+        Возвращает индексы элементов, которых нет среди уже доставленных,
+        и их хеши (пустой список хешей — дедупликация не применялась).
+        Сам ничего не помечает: хеши записываются в commit_delivered только
+        после доставки в Kafka или в спул, чтобы падение процесса между
+        приёмом и отправкой не превращало повтор клиента в «дубликат».
+
+        Повторы внутри выгрузки тоже отсекаются; pending — хеши, принятые
+        раньше в том же запросе (потоковая загрузка), дополняется новыми.
+        """
+        if not self.enabled or not items:
+            return list(range(len(items))), []
+
+        hashes = [self.item_hash(item) for item in items]
+        keys = self._keys(email, data_type)
+        try:
+            async with redis_client_async.pipeline(transaction=False) as pipe:
+                for h in hashes:
+                    for key in keys:
+                        pipe.sismember(key, h)
+                replies = await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Дедупликация недоступна, отправляем без неё: {e!r}")
+            INGEST_DEDUP_ITEMS.labels(data_type=data_type, result="bypass").inc(
+                len(items)
+            )
+            return list(range(len(items))), []
+
+        pending = set() if pending is None else pending
+        kept = []
+        for i, h in enumerate(hashes):
+            if replies[2 * i] or replies[2 * i + 1] or h in pending:
+                continue
+            pending.add(h)
+            kept.append(i)
+        INGEST_DEDUP_ITEMS.labels(data_type=data_type, result="miss").inc(len(kept))
+        INGEST_DEDUP_ITEMS.labels(data_type=data_type, result="hit").inc(
+            len(items) - len(kept)
+        )
+        return kept, [hashes[i] for i in kept]
+
+    async def commit(self, email: str, data_type: str, hashes: List[str]):
+        """Помечает элементы как доставленные (в Kafka или в спул)."""
+        if not hashes:
+            return
+        current, _ = self._keys(email, data_type)
+        try:
+            async with redis_client_async.pipeline(transaction=False) as pipe:
+                pipe.sadd(current, *hashes)
+                pipe.expire(current, 2 * self.ttl_seconds)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить отметки дедупликации: {e!r}")
+
+    async def commit_delivered(
+        self,
+        email: str,
+        data_type: str,
+        sent: List[Tuple[int, asyncio.Future]],
+        hashes: List[str],
+    ):
+        """Дожидается доставки батчей и помечает элементы из дошедших."""
+        if not hashes:
+            return
+        results = await asyncio.gather(
+            *(future for _, future in sent), return_exceptions=True
+        )
+        delivered, pos = [], 0
+        for (count, _), result in zip(sent, results):
+            if not isinstance(result, Exception):
+                delivered += hashes[pos : pos + count]
+            pos += count
+        await self.commit(email, data_type, delivered)
+
+    def commit_when_delivered(
+        self,
+        email: str,
+        data_type: str,
+        sent: List[Tuple[int, asyncio.Future]],
+        hashes: List[str],
+    ):
+        """То же, что commit_delivered, но не блокируя вызывающего."""
+        if not hashes:
+            return
+        task = asyncio.create_task(
+            self.commit_delivered(email, data_type, sent, hashes)
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+ingest_dedup = IngestDeduplicator(
+    settings.INGEST_DEDUP_ENABLED, settings.INGEST_DEDUP_TTL_SECONDS
+)
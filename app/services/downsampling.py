@@ -0,0 +1,69 @@
+from typing import Callable, List, Sequence, TypeVar
+
+import numpy as np
+
+T = TypeVar("T")
+
+
+def lttb_indices(
+    x: np.ndarray, y: np.ndarray, n_out: int, keep: np.ndarray | None = None
+) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: индексы n_out точек ряда (x по возрастанию),
+    сохраняющих визуальную форму графика. Первая и последняя точки входят всегда.
+
+    keep — булева маска точек, которые должны остаться в любом случае
+    (например, выбросы); под LTTB тогда отводится n_out минус их число.
+    """
+    n = len(x)
+    forced = np.flatnonzero(keep) if keep is not None else np.empty(0, dtype=np.intp)
+    n_out = max(3, n_out - len(forced))
+    if n <= n_out:
+        return np.arange(n)
+
+    # Границы n_out - 2 корзин между первой и последней точкой
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    # Средние точки корзин считаются сразу для всех корзин
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x[1 : n - 1], edges[:-1] - 1) / counts
+    avg_y = np.add.reduceat(y[1 : n - 1], edges[:-1] - 1) / counts
+    avg_x = np.append(avg_x[1:], x[-1])
+    avg_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(n_out, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Удвоенная площадь треугольника (A, точка корзины, среднее следующей)
+        area = np.abs(
+            (x[a] - avg_x[i]) * (y[lo:hi] - y[a])
+            - (x[a] - x[lo:hi]) * (avg_y[i] - y[a])
+        )
+        a = lo + int(area.argmax())
+        selected[i + 1] = a
+
+    if len(forced):
+        selected = np.union1d(selected, forced)
+    return selected
+
+
+def downsample(
+    points: Sequence[T],
+    max_points: int | None,
+    x: Callable[[T], float],
+    y: Callable[[T], float],
+    keep: Callable[[T], bool] | None = None,
+) -> List[T]:
+    """Прореживает points до ~max_points через LTTB; None — без прореживания."""
+    if max_points is None or len(points) <= max_points:
+        return list(points)
+    n = len(points)
+    xs = np.fromiter((x(p) for p in points), dtype=np.float64, count=n)
+    ys = np.fromiter((y(p) for p in points), dtype=np.float64, count=n)
+    mask = (
+        np.fromiter((keep(p) for p in points), dtype=bool, count=n)
+        if keep is not None
+        else None
+    )
+    return [points[i] for i in lttb_indices(xs, ys, max_points, mask)]
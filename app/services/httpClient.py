@@ -0,0 +1,59 @@
+import aiohttp
+import logging
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class HttpClientAsync:
+    """
+    Один aiohttp.ClientSession на процесс: общий пул keep-alive соединений
+    с ограничением числа соединений, вместо новой сессии (и TCP/TLS
+    рукопожатия) на каждый запрос к внешним сервисам.
+    """
+
+    _instance = None
+    _session = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(HttpClientAsync, cls).__new__(cls)
+        return cls._instance
+
+    async def connect(self):
+        if self._session is None:
+            connector = aiohttp.TCPConnector(
+                limit=settings.HTTP_CLIENT_LIMIT,
+                limit_per_host=settings.HTTP_CLIENT_LIMIT_PER_HOST,
+                keepalive_timeout=settings.HTTP_CLIENT_KEEPALIVE_TIMEOUT_SECONDS,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(
+                    total=settings.HTTP_CLIENT_TIMEOUT_SECONDS
+                ),
+            )
+            logger.info("HTTP-клиент запущен.")
+
+    async def disconnect(self):
+        if self._session:
+            await self._session.close()
+            logger.info("HTTP-клиент остановлен.")
+            self._session = None
+
+    def __getattr__(self, name):
+        """
+        Перенаправление всех запросов (кроме явно определённых методов)
+        к aiohttp.ClientSession. Если сессия не создана, генерируется исключение.
+        """
+        if self._session is None:
+            raise Exception(
+                "HTTP-клиент не подключен. Вызовите connect() перед использованием."
+            )
+        return getattr(self._session, name)
+
+    def __repr__(self):
+        return f"<HttpClient connected={self._session is not None}>"
+
+
+http_client_async: aiohttp.ClientSession = HttpClientAsync()
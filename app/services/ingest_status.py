@@ -0,0 +1,84 @@
+import asyncio
+import uuid
+from typing import List, Tuple
+
+from app.models.models import IngestResult
+from app.services.redisClient import redis_client_async
+from app.settings import settings
+
+
+class DeliveryTracker:
+    """
+    Собирает future доставки батчей одной выгрузки (в порядке элементов)
+    и после их завершения считает принятые / записанные в спул /
+    не доставленные элементы.
+    """
+
+    def __init__(self):
+        self._batches: List[Tuple[int, asyncio.Future]] = []
+        # Индексы отправленных элементов в исходной выгрузке
+        self._positions: List[int] = []
+        self.duplicates = 0
+
+    def add(self, batches: List[Tuple[int, asyncio.Future]], positions: List[int]):
+        self._batches.extend(batches)
+        self._positions.extend(positions)
+
+    async def result(self, data_type: str) -> IngestResult:
+        outcomes = await asyncio.gather(
+            *(future for _, future in self._batches), return_exceptions=True
+        )
+        accepted = failed = spooled = pos = 0
+        failed_ranges: List[List[int]] = []
+        spooled_ranges: List[List[int]] = []
+        for (count, _), outcome in zip(self._batches, outcomes):
+            positions = self._positions[pos : pos + count]
+            if isinstance(outcome, Exception):
+                failed += count
+                _add_ranges(failed_ranges, positions)
+            elif outcome is True:
+                # KafkaClient.send_many: батч записан в спул, а не в Kafka
+                spooled += count
+                _add_ranges(spooled_ranges, positions)
+            else:
+                accepted += count
+            pos += count
+        return IngestResult(
+            ingestId=uuid.uuid4().hex,
+            dataType=data_type,
+            accepted=accepted,
+            failed=failed,
+            duplicates=self.duplicates,
+            failedRanges=failed_ranges,
+            spooled=spooled,
+            spooledRanges=spooled_ranges,
+        )
+
+
+def _add_ranges(ranges: List[List[int]], positions: List[int]):
+    """Добавляет индексы к списку полуинтервалов [start, end), склеивая соседние."""
+    for index in positions:
+        if ranges and ranges[-1][1] == index:
+            ranges[-1][1] = index + 1
+        else:
+            ranges.append([index, index + 1])
+
+
+def _status_key(email: str, ingest_id: str) -> str:
+    return f"{settings.REDIS_INGEST_STATUS_NAMESPACE}{email}-{ingest_id}"
+
+
+async def save_ingest_status(email: str, result: IngestResult):
+    """Сохраняет результат выгрузки в Redis на INGEST_STATUS_TTL_SECONDS."""
+    await redis_client_async.set(
+        _status_key(email, result.ingestId),
+        result.model_dump_json(),
+        ex=settings.INGEST_STATUS_TTL_SECONDS,
+    )
+
+
+async def get_ingest_status(email: str, ingest_id: str) -> IngestResult | None:
+    payload = await redis_client_async.get(_status_key(email, ingest_id))
+    if payload is None:
+        return None
+    return IngestResult.model_validate_json(payload)
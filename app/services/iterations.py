@@ -0,0 +1,44 @@
+from datetime import datetime, timezone
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import IterationKind
+from app.services.db.schemas import LatestIterations
+
+
+async def complete_iteration(
+    session: AsyncSession,
+    email: str,
+    kind: IterationKind,
+    data_type: str,
+    iteration_num: int,
+    completed_at: datetime | None = None,
+) -> bool:
+    """
+    Переводит указатель latest_iterations на завершённую итерацию одним
+    UPSERT. Указатель только растёт: запоздавшее сообщение о более старой
+    итерации игнорируется. Возвращает True, если указатель изменился.
+    """
+    stmt = insert(LatestIterations).values(
+        email=email,
+        kind=kind.value,
+        data_type=data_type,
+        iteration_num=iteration_num,
+        completed_at=completed_at or datetime.now(timezone.utc),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[
+            LatestIterations.email,
+            LatestIterations.kind,
+            LatestIterations.data_type,
+        ],
+        set_={
+            "iteration_num": stmt.excluded.iteration_num,
+            "completed_at": stmt.excluded.completed_at,
+        },
+        where=LatestIterations.iteration_num <= stmt.excluded.iteration_num,
+    )
+    result = await session.execute(stmt)
+    await session.commit()
+    return result.rowcount > 0
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import time
+from typing import Dict
+
+from jose import jwk, jwt
+from jose.backends.base import Key
+
+from app.models.models import TokenData
+from app.services.httpClient import http_client_async
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class JwksClient:
+    """
+    Ключи auth-сервиса (JWKS) для локальной проверки JWT в get_current_user.
+    Загружаются при старте и обновляются в фоне раз в
+    AUTH_JWKS_REFRESH_INTERVAL_SECONDS; токен с неизвестным kid вызывает
+    внеочередное обновление (не чаще AUTH_JWKS_MIN_REFRESH_INTERVAL_SECONDS).
+    """
+
+    _instance = None
+    _keys: Dict[str, Key] = {}
+    _refresher = None
+    _refreshed_at = 0.0
+    _lock = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(JwksClient, cls).__new__(cls)
+        return cls._instance
+
+    async def connect(self):
+        self._lock = asyncio.Lock()
+        try:
+            await self.refresh()
+        except Exception as e:
+            # Без ключей get_current_user проверяет токены через auth-сервис
+            logger.error(f"Не удалось загрузить JWKS: {e!r}")
+        self._refresher = asyncio.create_task(self._refresh_periodically())
+
+    async def disconnect(self):
+        if self._refresher is not None:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+            self._refresher = None
+
+    @property
+    def ready(self) -> bool:
+        return bool(self._keys)
+
+    async def refresh(self):
+        async with http_client_async.get(settings.AUTH_JWKS_URL) as response:
+            response.raise_for_status()
+            jwks = await response.json()
+        keys = {}
+        for key in jwks.get("keys", []):
+            if key.get("use", "sig") != "sig" or "kid" not in key:
+                continue
+            algorithm = key.get("alg", settings.AUTH_JWT_ALGORITHMS[0])
+            if algorithm not in settings.AUTH_JWT_ALGORITHMS:
+                continue
+            keys[key["kid"]] = jwk.construct(key, algorithm)
+        self._keys = keys
+        self._refreshed_at = time.monotonic()
+        logger.info(f"JWKS обновлён: {len(keys)} ключей")
+
+    async def get_key(self, kid: str) -> Key | None:
+        key = self._keys.get(kid)
+        if key is not None:
+            return key
+        async with self._lock:
+            if (
+                kid not in self._keys
+                and time.monotonic() - self._refreshed_at
+                >= settings.AUTH_JWKS_MIN_REFRESH_INTERVAL_SECONDS
+            ):
+                try:
+                    await self.refresh()
+                except Exception as e:
+                    logger.warning(f"JWKS не обновлён: {e!r}")
+                    self._refreshed_at = time.monotonic()
+        return self._keys.get(kid)
+
+    async def _refresh_periodically(self):
+        while True:
+            await asyncio.sleep(settings.AUTH_JWKS_REFRESH_INTERVAL_SECONDS)
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"JWKS не обновлён, используем прежние ключи: {e!r}")
+
+    async def verify(self, token: str) -> TokenData | None:
+        """
+        Проверяет подпись и стандартные claims (exp, iss, aud) токена.
+        Возвращает TokenData или None, если в токене нет нужных полей
+        или ключ не найден — тогда нужна проверка через auth-сервис.
+        Недействительный токен приводит к jose.JWTError.
+        """
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = await self.get_key(kid) if kid else None
+        if key is None:
+            return None
+
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=settings.AUTH_JWT_ALGORITHMS,
+            audience=settings.AUTH_JWT_AUDIENCE,
+            issuer=settings.AUTH_JWT_ISSUER,
+            options={"verify_aud": settings.AUTH_JWT_AUDIENCE is not None},
+        )
+        if not all(field in claims for field in TokenData.model_fields):
+            return None
+        return TokenData.model_validate(claims)
+
+
+jwks_client = JwksClient()
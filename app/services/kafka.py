@@ -1,6 +1,15 @@
-import json
+import asyncio
+import itertools
 import logging
+from typing import Any, Awaitable, Dict, Iterable, List, Tuple
+
 from aiokafka import AIOKafkaProducer
+from aiokafka.errors import KafkaError, KafkaTimeoutError, MessageSizeTooLargeError
+from aiokafka.partitioner import DefaultPartitioner
+from app.models.models import TokenData
+from app.services.kafka_codecs import Headers, KafkaCodec, get_codec
+from app.services.spool import KafkaSpool, Record
+from app.services.utils import KAFKA_SPOOLED_RECORDS, KAFKA_SPOOL_REPLAYED_RECORDS
 from app.settings import settings
 
 logger = logging.getLogger(__name__)
@@ -9,6 +18,13 @@ logger = logging.getLogger(__name__)
 class KafkaClient:
     _instance = None
     _producer = None
+    _codec: KafkaCodec = None
+    _spool: KafkaSpool | None = None
+    _drainer: asyncio.Task | None = None
+    _partitioner = DefaultPartitioner()
+    # Последняя незавершённая доставка по ключу записи: следующий батч
+    # того же ключа дожидается её исхода, см. _deliver_or_spool
+    _last_delivery: Dict[bytes, asyncio.Future] = {}
 
     def __new__(cls):
         if cls._instance is None:
@@ -18,38 +34,327 @@ class KafkaClient:
     async def connect(self):
         """
         Подключение к Kafka. Если продюсер ещё не проинициализирован, создаём его.
+
+        При включённом спуле (KAFKA_SPOOL_ENABLED) недоступность брокера
+        на старте не фатальна: данные пишутся в спул, а фоновый дренер
+        переподключается и воспроизводит их, когда Kafka вернётся.
         """
+        if self._codec is None:
+            # Значения сериализуются кодеком в send()/send_many(),
+            # чтобы вместе с ними проставлять заголовки формата
+            self._codec = get_codec()
+
+        if settings.KAFKA_SPOOL_ENABLED and self._spool is None:
+            self._spool = KafkaSpool(
+                settings.KAFKA_SPOOL_DIR,
+                segment_max_bytes=settings.KAFKA_SPOOL_SEGMENT_MAX_BYTES,
+                max_bytes=settings.KAFKA_SPOOL_MAX_BYTES,
+            )
+            self._spool.open()
+            self._drainer = asyncio.create_task(self._drain_spool())
+
         if self._producer is None:
             try:
-                self._producer = AIOKafkaProducer(
-                    bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVERS,
-                    value_serializer=lambda v: json.dumps(v).encode("utf-8"),
-                )
-                await self._producer.start()
-                logger.info(f"Подключение к Kafka: {settings.KAFKA_BOOTSTRAP_SERVERS}")
+                await self._start_producer()
             except Exception as e:
                 logger.error(f"Ошибка подключения к Kafka: {e}")
-                raise
+                if self._spool is None:
+                    raise
+
+    async def _start_producer(self):
+        producer = AIOKafkaProducer(
+            bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVERS,
+            max_batch_size=settings.KAFKA_PRODUCER_MAX_BATCH_SIZE,
+            max_request_size=settings.KAFKA_PRODUCER_MAX_REQUEST_SIZE,
+            linger_ms=settings.KAFKA_PRODUCER_LINGER_MS,
+        )
+        try:
+            await producer.start()
+        except Exception:
+            await producer.stop()
+            raise
+        self._producer = producer
+        logger.info(
+            f"Подключение к Kafka: {settings.KAFKA_BOOTSTRAP_SERVERS}, "
+            f"формат сообщений: {self._codec.content_type}, "
+            f"версия схемы: {self._codec.schema_version}"
+        )
 
     async def disconnect(self):
         """
         Отключение от Kafka и сброс продюсера.
         """
+        if self._drainer:
+            self._drainer.cancel()
+            self._drainer = None
         if self._producer:
             await self._producer.stop()
             logger.info("Отключение от Kafka.")
             self._producer = None
+        if self._spool:
+            self._spool.close()
+            self._spool = None
 
-    def __getattr__(self, name):
+    @staticmethod
+    def user_key(user_data: TokenData) -> bytes:
         """
-        Перенаправление всех вызовов (кроме явно определённых методов) к объекту продюсера.
-        Если продюсер не подключён, генерируется исключение.
+        Ключ записи: email или google_sub (KAFKA_RECORD_KEY_FIELD).
+        Все данные пользователя попадают в одну партицию и не переупорядочиваются.
+        """
+        return getattr(user_data, settings.KAFKA_RECORD_KEY_FIELD).encode("utf-8")
+
+    @staticmethod
+    def user_headers(user_data: TokenData) -> Headers:
+        """Идентификаторы пользователя в заголовках вместо копии TokenData в payload."""
+        return [
+            ("user-email", user_data.email.encode("utf-8")),
+            ("user-google-sub", user_data.google_sub.encode("utf-8")),
+        ]
+
+    async def send(
+        self,
+        topic: str,
+        value: Dict[str, Any],
+        key: bytes | None = None,
+        headers: Headers | None = None,
+    ) -> asyncio.Future:
+        """
+        Отправка одного сообщения, закодированного текущим кодеком,
+        с заголовками content-type / schema-version.
+        """
+        return await self._get_producer().send(
+            topic,
+            self._codec.encode(value),
+            key=key,
+            headers=self._codec.headers + (headers or []),
+        )
+
+    async def send_many(
+        self,
+        topic: str,
+        values: Iterable[Dict[str, Any]],
+        key: bytes | None = None,
+        headers: Headers | None = None,
+    ) -> List[Tuple[int, asyncio.Future]]:
+        """
+        Пакетная отправка: упаковывает values в record batch'и размером не более
+        KAFKA_PRODUCER_MAX_BATCH_SIZE и ставит их в очередь продюсера целиком,
+        вместо отдельного send() на каждое сообщение.
+
+        Все батчи одного вызова уходят в одну партицию (по key, либо случайную),
+        поэтому порядок сообщений сохраняется.
+        Возвращает список (число сообщений в батче, future доставки батча).
+
+        Если брокер недоступен, буфер продюсера переполнен или доставка батча
+        не удалась, записи уходят в спул; future при этом завершается успешно.
+        Вместе с не доставленным батчем в спул уходят и все следующие батчи
+        того же ключа (в том числе из последующих вызовов), чтобы они
+        не обогнали данные, которые будут воспроизведены из спула.
+        """
+        headers = self._codec.headers + (headers or [])
+        encode = self._codec.encode
+        records = [(key, encode(value), headers) for value in values]
+        if not records:
+            return []
+
+        if self._spool is None:
+            queued = []
+            await self._enqueue(topic, records, queued)
+            return [(len(batch), future) for batch, future in queued]
+
+        if self._producer is None or self._spool.pending:
+            # Пока в спуле есть записи, новые пишем туда же — иначе
+            # они обогнали бы ещё не воспроизведённые данные пользователя
+            reason = "unavailable" if self._producer is None else "backlog"
+            await self._spool_records(topic, records, reason)
+            return [(len(records), self._done_future(True))]
+
+        queued = []
+        spooled = []
+        try:
+            await self._enqueue(topic, records, queued)
+        except MessageSizeTooLargeError:
+            raise
+        except KafkaError as e:
+            logger.warning(f"Kafka не принимает записи, пишем в спул: {e!r}")
+            rest = records[sum(len(batch) for batch, _ in queued) :]
+            reason = "buffer_full" if isinstance(e, KafkaTimeoutError) else "error"
+            await self._spool_records(topic, rest, reason)
+            spooled.append((len(rest), self._done_future(True)))
+
+        deliveries = []
+        previous = self._last_delivery.get(key) if key is not None else None
+        for batch, future in queued:
+            previous = asyncio.ensure_future(
+                self._deliver_or_spool(topic, batch, future, previous)
+            )
+            deliveries.append((len(batch), previous))
+        deliveries += spooled
+        if key is not None and deliveries:
+            self._track_last_delivery(key, deliveries[-1][1])
+        return deliveries
+
+    def _track_last_delivery(self, key: bytes, delivery: asyncio.Future):
+        self._last_delivery[key] = delivery
+
+        def forget(_):
+            if self._last_delivery.get(key) is delivery:
+                del self._last_delivery[key]
+
+        delivery.add_done_callback(forget)
+
+    async def _enqueue(
+        self,
+        topic: str,
+        records: List[Record],
+        queued: List[Tuple[List[Record], asyncio.Future]],
+    ):
         """
+        Ставит записи (с общим ключом) в очередь продюсера батчами.
+        Уже поставленные батчи добавляются в queued по мере отправки, чтобы при
+        ошибке вызывающий код знал, какие записи остались неотправленными.
+
+        Ожидание метаданных и места в буфере продюсера ограничено
+        KAFKA_ENQUEUE_TIMEOUT_SECONDS: при недоступном брокере aiokafka ждёт
+        до request_timeout_ms / max_block_ms, а запрос клиента всё это время
+        висел бы. По таймауту поднимается KafkaTimeoutError, и send_many
+        пишет оставшиеся записи в спул.
+        """
+        producer = self._get_producer()
+        partitions = sorted(
+            await self._with_timeout(
+                producer.partitions_for(topic), "получение метаданных топика"
+            )
+        )
+        partition = self._partitioner(records[0][0], partitions, partitions)
+
+        batch = producer.create_batch()
+        start = 0
+        for i, (key, value, headers) in enumerate(records):
+            if batch.append(key=key, value=value, timestamp=None, headers=headers) is None:
+                future = await self._with_timeout(
+                    producer.send_batch(batch, topic, partition=partition),
+                    "постановка батча в очередь",
+                )
+                queued.append((records[start:i], future))
+                start = i
+                batch = producer.create_batch()
+                if batch.append(
+                    key=key, value=value, timestamp=None, headers=headers
+                ) is None:
+                    raise ValueError(
+                        "Сообщение не помещается в пустой батч: "
+                        "увеличьте KAFKA_PRODUCER_MAX_BATCH_SIZE"
+                    )
+        if batch.record_count():
+            future = await self._with_timeout(
+                producer.send_batch(batch, topic, partition=partition),
+                "постановка батча в очередь",
+            )
+            queued.append((records[start:], future))
+
+    @staticmethod
+    async def _with_timeout(awaitable: Awaitable, what: str):
+        try:
+            return await asyncio.wait_for(
+                awaitable, settings.KAFKA_ENQUEUE_TIMEOUT_SECONDS
+            )
+        except asyncio.TimeoutError:
+            raise KafkaTimeoutError(
+                f"Kafka: {what} не завершилась за KAFKA_ENQUEUE_TIMEOUT_SECONDS"
+            )
+
+    async def _deliver_or_spool(
+        self,
+        topic: str,
+        records: List[Record],
+        future: asyncio.Future,
+        previous: asyncio.Future | None = None,
+    ) -> bool:
+        """
+        Дожидается доставки батча, при ошибке пишет его в спул.
+        Возвращает True, если батч оказался в спуле.
+
+        previous — доставка предыдущего батча того же ключа. Если он ушёл
+        в спул, этот батч тоже пишется в спул, даже если Kafka его уже
+        приняла: копия из спула придёт после воспроизведённых записей, как
+        при любом повторе из спула (доставка at-least-once).
+        """
+        previous_spooled = False
+        if previous is not None:
+            try:
+                previous_spooled = await previous
+            except Exception:
+                # Батч не помещается в Kafka и не спулится — порядок не нарушает
+                pass
+        try:
+            await future
+        except MessageSizeTooLargeError:
+            raise
+        except KafkaError as e:
+            logger.warning(f"Батч не доставлен в Kafka, пишем в спул: {e!r}")
+            await self._spool_records(topic, records, "delivery_failed")
+            return True
+        if previous_spooled:
+            await self._spool_records(topic, records, "after_failed_batch")
+            return True
+        return False
+
+    async def _spool_records(self, topic: str, records: List[Record], reason: str):
+        await self._spool.append(topic, records)
+        KAFKA_SPOOLED_RECORDS.labels(reason=reason).inc(len(records))
+
+    @staticmethod
+    def _done_future(result: Any = None) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(result)
+        return future
+
+    async def _drain_spool(self):
+        """Фоновая задача: переподключается к Kafka и воспроизводит спул по порядку."""
+        while True:
+            await asyncio.sleep(settings.KAFKA_SPOOL_DRAIN_INTERVAL_SECONDS)
+            if not self._spool.pending:
+                continue
+            try:
+                if self._producer is None:
+                    await self._start_producer()
+                await self._replay_spool()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Спул Kafka не воспроизведён, повторим позже: {e!r}")
+
+    async def _replay_spool(self):
+        while (path := await self._spool.oldest()) is not None:
+            entries = await self._spool.read(path)
+            futures = []
+            for (topic, _), group in itertools.groupby(
+                entries, key=lambda entry: (entry[0], entry[1])
+            ):
+                queued = []
+                await self._enqueue(
+                    topic, [(key, value, headers) for _, key, value, headers in group], queued
+                )
+                futures += [future for _, future in queued]
+            await asyncio.gather(*futures)
+            await self._spool.remove(path)
+            KAFKA_SPOOL_REPLAYED_RECORDS.inc(len(entries))
+            logger.info(f"Из спула Kafka воспроизведено {len(entries)} записей")
+
+    def _get_producer(self) -> AIOKafkaProducer:
         if self._producer is None:
             raise Exception(
                 "Kafka продюсер не подключен. Вызовите connect() перед использованием."
             )
-        return getattr(self._producer, name)
+        return self._producer
+
+    def __getattr__(self, name):
+        """
+        Перенаправление всех вызовов (кроме явно определённых методов) к объекту продюсера.
+        Если продюсер не подключён, генерируется исключение.
+        """
+        return getattr(self._get_producer(), name)
 
     def __repr__(self):
         return f"<KafkaClient connected={self._producer is not None}>"
@@ -0,0 +1,108 @@
+import json
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Tuple, Type
+
+import msgpack
+
+from app.settings import settings
+
+Headers = List[Tuple[str, bytes]]
+
+SCHEMA_VERSIONS = (1, 2)
+
+
+class KafkaCodec(ABC):
+    """
+    Кодек значения Kafka-сообщения с сырыми данными (KafkaRawDataMsg).
+    Формат описывается заголовками content-type и schema-version,
+    по которым консьюмер выбирает способ декодирования.
+
+    Версии схемы (KAFKA_VALUE_SCHEMA_VERSION):
+      1 — {rawData, dataType, userData};
+      2 — {rawData, dataType}, пользователь только в ключе и заголовках записи.
+    """
+
+    content_type: str
+
+    def __init__(self, schema_version: int):
+        if schema_version not in SCHEMA_VERSIONS:
+            raise ValueError(
+                f"Неизвестная KAFKA_VALUE_SCHEMA_VERSION: {schema_version}, "
+                f"доступны: {', '.join(map(str, SCHEMA_VERSIONS))}"
+            )
+        self.schema_version = schema_version
+
+    @abstractmethod
+    def encode(self, msg: Dict[str, Any]) -> bytes:
+        ...
+
+    @abstractmethod
+    def decode(self, data: bytes) -> Dict[str, Any]:
+        ...
+
+    @property
+    def headers(self) -> Headers:
+        return [
+            ("content-type", self.content_type.encode()),
+            ("schema-version", str(self.schema_version).encode()),
+        ]
+
+
+class JsonCodec(KafkaCodec):
+    """Исходный формат: JSON-объект с полными именами полей."""
+
+    content_type = "application/json"
+
+    def encode(self, msg: Dict[str, Any]) -> bytes:
+        if self.schema_version >= 2:
+            msg = {"rawData": msg["rawData"], "dataType": msg["dataType"]}
+        return json.dumps(msg).encode("utf-8")
+
+    def decode(self, data: bytes) -> Dict[str, Any]:
+        return json.loads(data)
+
+
+class MsgpackCodec(KafkaCodec):
+    """
+    Компактный бинарный формат: msgpack-массив с позиционными полями
+    [schema_version, dataType, rawData, [google_sub, email, name, picture]]
+    (в версии 2 — без последнего элемента), без повторения имён полей
+    конверта в каждом сообщении.
+    """
+
+    content_type = "application/x-msgpack"
+
+    _USER_FIELDS = ("google_sub", "email", "name", "picture")
+
+    def encode(self, msg: Dict[str, Any]) -> bytes:
+        fields = [self.schema_version, msg["dataType"], msg["rawData"]]
+        if self.schema_version == 1:
+            user = msg["userData"]
+            fields.append([user[field] for field in self._USER_FIELDS])
+        return msgpack.packb(fields)
+
+    def decode(self, data: bytes) -> Dict[str, Any]:
+        version, data_type, raw_data, *user = msgpack.unpackb(data)
+        if version not in SCHEMA_VERSIONS:
+            raise ValueError(f"Неподдерживаемая версия схемы: {version}")
+        msg = {"rawData": raw_data, "dataType": data_type}
+        if version == 1:
+            msg["userData"] = dict(zip(self._USER_FIELDS, user[0]))
+        return msg
+
+
+CODECS: Dict[str, Type[KafkaCodec]] = {
+    "json": JsonCodec,
+    "msgpack": MsgpackCodec,
+}
+
+
+def get_codec(name: str | None = None, schema_version: int | None = None) -> KafkaCodec:
+    name = name or settings.KAFKA_VALUE_CODEC
+    try:
+        codec = CODECS[name]
+    except KeyError:
+        raise ValueError(
+            f"Неизвестный KAFKA_VALUE_CODEC: {name}, доступны: {', '.join(CODECS)}"
+        )
+    return codec(schema_version or settings.KAFKA_VALUE_SCHEMA_VERSION)
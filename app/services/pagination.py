@@ -0,0 +1,74 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import Any, Dict, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import Integer, Select, bindparam, tuple_
+
+from app.settings import settings
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(time: datetime, record_id: int) -> str:
+    """Непрозрачный курсор на позицию (time, id) последней отданной записи."""
+    raw = f"{time.isoformat()},{record_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        time, record_id = raw.decode("utf-8").rsplit(",", 1)
+        return datetime.fromisoformat(time), int(record_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+def page_size(limit: int | None) -> int:
+    """
+    Размер страницы с учётом серверного ограничения SERIES_MAX_PAGE_SIZE;
+    без limit страница максимальная, чтобы запрос без параметров отдавал
+    как можно большую часть ряда, как до появления пагинации.
+    """
+    return min(limit or settings.SERIES_MAX_PAGE_SIZE, settings.SERIES_MAX_PAGE_SIZE)
+
+
+def paginate_by_time(
+    stmt: Select, model, has_from: bool, has_to: bool, has_cursor: bool
+) -> Select:
+    """
+    Ограничивает запрос по ряду окном [from_, to) и keyset-страницей
+    по (time, id) после курсора. Значения передаются параметрами при
+    выполнении (page_params), поэтому запрос можно построить один раз
+    на сочетание фильтров. Выбирается limit + 1 строк: лишняя строка
+    означает, что есть следующая страница.
+    """
+    if has_from:
+        stmt = stmt.where(model.time >= bindparam("from_", type_=model.time.type))
+    if has_to:
+        stmt = stmt.where(model.time < bindparam("to", type_=model.time.type))
+    if has_cursor:
+        stmt = stmt.where(
+            tuple_(model.time, model.id)
+            > tuple_(
+                bindparam("cursor_time", type_=model.time.type),
+                bindparam("cursor_id", type_=model.id.type),
+            )
+        )
+    return stmt.order_by(model.time, model.id).limit(
+        bindparam("page_limit", type_=Integer)
+    )
+
+
+def page_params(
+    from_: datetime | None, to: datetime | None, cursor: str | None, limit: int
+) -> Dict[str, Any]:
+    """Параметры запроса paginate_by_time."""
+    params = {"from_": from_, "to": to, "page_limit": limit + 1}
+    if cursor is not None:
+        params["cursor_time"], params["cursor_id"] = decode_cursor(cursor)
+    return params
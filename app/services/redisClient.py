@@ -8,6 +8,7 @@ logger = logging.getLogger(__name__)
 class RedisClientAsync:
     _instance = None
     _redis = None
+    _redis_binary = None
 
     def __new__(cls):
         if cls._instance is None:
@@ -24,6 +25,12 @@ class RedisClientAsync:
                     f"redis://{settings.REDIS_HOST}",
                     decode_responses=True,
                 )
+                # Отдельный пул без декодирования ответов — для бинарных
+                # значений (сжатые ответы series_cache)
+                self._redis_binary = await aioredis.from_url(
+                    f"redis://{settings.REDIS_HOST}",
+                    decode_responses=False,
+                )
                 logger.info(f"Подключение к Redis: redis://{settings.REDIS_HOST}")
             except Exception as e:
                 logger.error(f"Ошибка подключения к Redis: {e}")
@@ -35,8 +42,19 @@ class RedisClientAsync:
         """
         if self._redis:
             await self._redis.close()
+            await self._redis_binary.close()
             logger.info("Отключение от Redis.")
             self._redis = None
+            self._redis_binary = None
+
+    @property
+    def binary(self) -> aioredis.Redis:
+        """Клиент, возвращающий значения как bytes."""
+        if self._redis_binary is None:
+            raise Exception(
+                "Redis не подключен. Вызовите connect() перед использованием."
+            )
+        return self._redis_binary
 
     def __getattr__(self, name):
         """
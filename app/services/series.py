@@ -0,0 +1,274 @@
+"""
+Чтение рядов для /get_data: одна реализация для raw_records и
+processed_records (SeriesSource). Запросы строятся один раз на сочетание
+источника и фильтров с именованными параметрами (email, data_type, ...)
+и дальше переиспользуются, в том числе скомпилированными из кеша SQLAlchemy.
+"""
+
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List
+
+from fastapi import HTTPException, Request, Response, status
+from sqlalchemy import Select, bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import SeriesSource
+from app.services.conditional import (
+    is_not_modified,
+    make_etag,
+    not_modified,
+    validator_headers,
+)
+from app.services.db.queries import (
+    OUTLIERS,
+    SOURCES,
+    series_outliers_history_iteration_select,
+    series_outliers_watermark_select,
+    series_select,
+    series_with_outliers_select,
+)
+from app.services.downsampling import downsample
+from app.services.pagination import (
+    NEXT_CURSOR_HEADER,
+    encode_cursor,
+    page_params,
+    page_size,
+    paginate_by_time,
+)
+from app.services.redisClient import redis_client_async
+from app.services.series_cache import series_cache
+from app.services.series_response import columnar_response, columns, data_records
+from app.services.utils import LATEST_ITERATION_LOOKUPS
+from app.settings import settings
+
+_EMAIL = bindparam("email")
+_DATA_TYPE = bindparam("data_type")
+
+
+@lru_cache(maxsize=None)
+def _page_stmt(
+    source: SeriesSource, has_from: bool, has_to: bool, has_cursor: bool
+) -> Select:
+    model = SOURCES[source]
+    return paginate_by_time(
+        series_select(model, _EMAIL, _DATA_TYPE), model, has_from, has_to, has_cursor
+    )
+
+
+@lru_cache(maxsize=None)
+def _watermark_stmt(source: SeriesSource, latest_pointer: bool) -> Select:
+    return series_outliers_watermark_select(
+        SOURCES[source], _EMAIL, _DATA_TYPE, latest_pointer
+    )
+
+
+@lru_cache(maxsize=None)
+def _history_iteration_stmt(source: SeriesSource) -> Select:
+    return series_outliers_history_iteration_select(
+        SOURCES[source], _EMAIL, _DATA_TYPE
+    )
+
+
+@lru_cache(maxsize=None)
+def _with_outliers_stmt(source: SeriesSource) -> Select:
+    return series_with_outliers_select(
+        SOURCES[source], _EMAIL, _DATA_TYPE, bindparam("iteration")
+    )
+
+
+def _points(rows, columnar: bool, epoch_ms: bool) -> Dict[str, List] | List[Dict]:
+    points = ((row.time, row.value_num) for row in rows)
+    return columns(points, epoch_ms) if columnar else data_records(points)
+
+
+async def read_series(
+    session: AsyncSession,
+    source: SeriesSource,
+    email: str,
+    data_type: str,
+    from_: datetime | None = None,
+    to: datetime | None = None,
+    cursor: str | None = None,
+    limit: int | None = None,
+    max_points: int | None = None,
+    columnar: bool = False,
+    epoch_ms: bool = False,
+) -> Response:
+    """
+    Страница ряда в окне [from_, to) после cursor (курсор следующей
+    страницы — в заголовке X-Next-Cursor).
+
+    С max_points страниц нет: LTTB прореживает всё окно целиком (не больше
+    SERIES_DOWNSAMPLE_MAX_SOURCE_POINTS точек, иначе 400) до
+    min(max_points, limit) точек, а не только его первую страницу.
+    Готовый ответ кешируется в series_cache.
+    """
+    limit = page_size(limit)
+    cache_key, cached = await series_cache.lookup(
+        email,
+        source.value,
+        data_type,
+        {
+            "from": from_,
+            "to": to,
+            "cursor": cursor,
+            "limit": limit,
+            "max_points": max_points,
+            "columnar": columnar,
+            "epoch_ms": epoch_ms,
+        },
+    )
+    if cached is not None:
+        return cached
+
+    stmt = _page_stmt(source, from_ is not None, to is not None, cursor is not None)
+    params = {"email": email, "data_type": data_type}
+    window_limit = (
+        limit if max_points is None else settings.SERIES_DOWNSAMPLE_MAX_SOURCE_POINTS
+    )
+    params.update(page_params(from_, to, cursor, window_limit))
+
+    try:
+        rows = (await session.execute(stmt, params)).all()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error: {str(e)}"
+        )
+
+    headers = {}
+    if max_points is None:
+        if len(rows) > limit:
+            rows = rows[:limit]
+            headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].time, rows[-1].id)
+    else:
+        if len(rows) > window_limit:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=(
+                    "Window exceeds SERIES_DOWNSAMPLE_MAX_SOURCE_POINTS "
+                    f"({window_limit} points), narrow it with from/to"
+                ),
+            )
+        rows = downsample(
+            rows,
+            min(max_points, limit),
+            x=lambda row: row.time.timestamp(),
+            y=lambda row: row.value_num,
+        )
+
+    series = columnar_response(_points(rows, columnar, epoch_ms), headers=headers)
+    await series_cache.store(cache_key, series)
+    return series
+
+
+async def _history_iteration(
+    session: AsyncSession, source: SeriesSource, email: str, data_type: str
+) -> int:
+    """Последняя завершённая итерация выбросов по истории (без latest_iterations)."""
+    iteration = (
+        await session.execute(
+            _history_iteration_stmt(source), {"email": email, "data_type": data_type}
+        )
+    ).scalar()
+    return await _completed_iteration(email, iteration)
+
+
+async def _completed_iteration(email: str, iteration: int | None) -> int:
+    """
+    Последняя завершённая итерация по максимальной итерации в истории.
+    Пока у пользователя идёт поиск выбросов, последняя итерация может быть
+    записана не полностью, поэтому берётся предыдущая.
+    """
+    if iteration is None:
+        return 0
+    flag = await redis_client_async.get(
+        f"{settings.REDIS_FIND_OUTLIERS_JOB_IS_ACTIVE_NAMESPACE}{email}"
+    )
+    return iteration - 1 if flag == "true" else iteration
+
+
+async def read_series_with_outliers(
+    session: AsyncSession,
+    request: Request,
+    source: SeriesSource,
+    email: str,
+    data_type: str,
+    max_points: int | None = None,
+    columnar: bool = False,
+    epoch_ms: bool = False,
+) -> Response:
+    """
+    Весь ряд и времена его выбросов последней завершённой итерации
+    (latest_iterations при LATEST_ITERATIONS_ENABLED, иначе или без строки
+    там — по истории): {"data": ..., "outliersX": [...]}.
+    Точки-выбросы переживают прореживание LTTB. Ответ несёт ETag по
+    (max(id), count, итерация); совпавший If-None-Match получает 304
+    без выборки самих точек.
+
+    Цена 304 — один запрос watermark и GET флага поиска выбросов в Redis.
+    С LATEST_ITERATIONS_ENABLED итерация берётся по PK latest_iterations,
+    без него — max() по истории в том же запросе, что стоит поиска по индексу
+    таблицы выбросов на каждую точку ряда.
+    """
+    latest_pointer = settings.LATEST_ITERATIONS_ENABLED
+    try:
+        last_id, count, iteration = (
+            await session.execute(
+                _watermark_stmt(source, latest_pointer),
+                {"email": email, "data_type": data_type},
+            )
+        ).one()
+        if not latest_pointer:
+            iteration = await _completed_iteration(email, iteration)
+        else:
+            kind = OUTLIERS[SOURCES[source]][2]
+            LATEST_ITERATION_LOOKUPS.labels(
+                kind=kind.value, result="miss" if iteration is None else "hit"
+            ).inc()
+            if iteration is None:
+                iteration = await _history_iteration(
+                    session, source, email, data_type
+                )
+
+        etag = make_etag(
+            f"{source.value}_data_with_outliers",
+            email,
+            data_type,
+            last_id,
+            count,
+            iteration,
+            max_points,
+            columnar,
+            epoch_ms,
+        )
+        if is_not_modified(request, etag):
+            return not_modified(etag)
+
+        rows = (
+            await session.execute(
+                _with_outliers_stmt(source),
+                {"email": email, "data_type": data_type, "iteration": iteration},
+            )
+        ).all()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Ошибка при выборке данных: {e}",
+        )
+
+    outliers_x: List[Any] = [row.time for row in rows if row.is_outlier]
+    if columnar and epoch_ms:
+        outliers_x = [int(time.timestamp() * 1000) for time in outliers_x]
+    rows = downsample(
+        rows,
+        max_points,
+        x=lambda row: row.time.timestamp(),
+        y=lambda row: row.value_num,
+        keep=lambda row: row.is_outlier,
+    )
+
+    return columnar_response(
+        {"data": _points(rows, columnar, epoch_ms), "outliersX": outliers_x},
+        headers=validator_headers(etag),
+    )
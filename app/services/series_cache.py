@@ -0,0 +1,134 @@
+import hashlib
+import json
+import logging
+import zlib
+from typing import Any, Mapping, Tuple
+
+from fastapi import Response
+
+from app.services.redisClient import redis_client_async
+from app.services.utils import (
+    SERIES_CACHE_BYTES_SAVED,
+    SERIES_CACHE_LOOKUPS,
+    SERIES_CACHE_STORED_BYTES,
+)
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class SeriesCache:
+    """
+    Read-through кеш готовых ответов /get_data/{raw,processed}_data: дашборды
+    много раз в день перечитывают одни и те же ряды целиком.
+
+    Ключ — (email, source, data_type, параметры запроса) плюс версия данных
+    пользователя. invalidate() увеличивает версию, и старые записи становятся
+    недостижимыми (их удаляет TTL). Версия читается до запроса в БД, поэтому
+    ответ, посчитанный до инвалидации, не попадает под новую версию.
+    Тело хранится сжатым zlib; при недоступности Redis кеш пропускается.
+    """
+
+    def __init__(
+        self, enabled: bool, ttl_seconds: int, max_bytes: int, compression_level: int
+    ):
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.compression_level = compression_level
+
+    @staticmethod
+    def _version_key(email: str) -> str:
+        return f"{settings.REDIS_SERIES_CACHE_NAMESPACE}version-{email}"
+
+    @staticmethod
+    def _entry_key(
+        email: str, version: str, source: str, data_type: str, params: Mapping
+    ) -> str:
+        canonical = json.dumps(params, sort_keys=True, default=str)
+        digest = hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
+        return (
+            f"{settings.REDIS_SERIES_CACHE_NAMESPACE}"
+            f"{email}-{version}-{source}-{data_type}-{digest}"
+        )
+
+    async def lookup(
+        self, email: str, source: str, data_type: str, params: Mapping[str, Any]
+    ) -> Tuple[str | None, Response | None]:
+        """
+        Возвращает (ключ для store, закешированный ответ или None).
+        Ключ None — кеш выключен или недоступен, сохранять не нужно.
+        """
+        if not self.enabled:
+            return None, None
+        try:
+            version = await redis_client_async.get(self._version_key(email)) or "0"
+            key = self._entry_key(email, version, source, data_type, params)
+            entry = await redis_client_async.binary.hgetall(key)
+        except Exception as e:
+            logger.warning(f"Кеш рядов недоступен: {e!r}")
+            SERIES_CACHE_LOOKUPS.labels(source=source, result="bypass").inc()
+            return None, None
+
+        if not entry:
+            SERIES_CACHE_LOOKUPS.labels(source=source, result="miss").inc()
+            return key, None
+
+        try:
+            body = zlib.decompress(entry[b"body"])
+            headers = {
+                name.decode("utf-8"): value.decode("utf-8")
+                for name, value in entry.items()
+                if name != b"body"
+            }
+        except (zlib.error, KeyError, ValueError) as e:
+            # Повреждённая запись — считаем промахом, store() её перезапишет
+            logger.warning(f"Повреждённая запись в кеше рядов {key}: {e!r}")
+            SERIES_CACHE_LOOKUPS.labels(source=source, result="miss").inc()
+            return key, None
+        SERIES_CACHE_LOOKUPS.labels(source=source, result="hit").inc()
+        SERIES_CACHE_BYTES_SAVED.labels(source=source).inc(len(body))
+        return key, Response(
+            content=body, media_type="application/json", headers=headers
+        )
+
+    async def store(self, key: str | None, response: Response):
+        """Сохраняет тело ответа и его заголовки из `response` под ключом из lookup."""
+        if key is None or len(response.body) > self.max_bytes:
+            return
+        compressed = zlib.compress(response.body, self.compression_level)
+        mapping = {"body": compressed}
+        for name in response.headers.keys():
+            # content-length и content-type Response выставит сам
+            if name not in ("content-length", "content-type"):
+                mapping[name] = response.headers[name]
+        try:
+            async with redis_client_async.binary.pipeline(transaction=True) as pipe:
+                pipe.hset(key, mapping=mapping)
+                pipe.expire(key, self.ttl_seconds)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить ряд в кеш: {e!r}")
+            return
+        SERIES_CACHE_STORED_BYTES.labels(encoding="identity").inc(len(response.body))
+        SERIES_CACHE_STORED_BYTES.labels(encoding="zlib").inc(len(compressed))
+
+    async def invalidate(self, email: str):
+        """
+        Делает недостижимыми все закешированные ряды пользователя.
+        Ошибка Redis не прерывает запрос: старые записи доживут до TTL.
+        """
+        if not self.enabled:
+            return
+        try:
+            await redis_client_async.incr(self._version_key(email))
+        except Exception as e:
+            logger.warning(f"Не удалось сбросить кеш рядов {email}: {e!r}")
+
+
+series_cache = SeriesCache(
+    settings.SERIES_CACHE_ENABLED,
+    settings.SERIES_CACHE_TTL_SECONDS,
+    settings.SERIES_CACHE_MAX_BYTES,
+    settings.SERIES_CACHE_COMPRESSION_LEVEL,
+)
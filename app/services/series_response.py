@@ -0,0 +1,42 @@
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Mapping, Tuple
+
+import orjson
+from fastapi import Response
+
+# datetime из asyncpg приходят в UTC: orjson выводит их как
+# "2024-01-01T00:00:00Z" — тот же формат, что DataRecord.X
+_ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_OMIT_MICROSECONDS
+
+
+def columns(
+    rows: Iterable[Tuple[datetime, float]], epoch_ms: bool = False
+) -> Dict[str, List]:
+    """
+    Ряд (time, value) в колоночном виде {"X": [...], "Y": [...]}
+    без создания DataRecord на каждую точку.
+    С epoch_ms X — целые миллисекунды Unix-времени.
+    """
+    times, values = [], []
+    for time, value in rows:
+        times.append(time)
+        values.append(value)
+    if epoch_ms:
+        times = [int(time.timestamp() * 1000) for time in times]
+    return {"X": times, "Y": values}
+
+
+def data_records(rows: Iterable[Tuple[datetime, float]]) -> List[Dict[str, Any]]:
+    """Ряд (time, value) в виде [{"X": ..., "Y": ...}], как List[DataRecord]."""
+    return [{"X": time, "Y": value} for time, value in rows]
+
+
+def columnar_response(
+    content: Mapping[str, Any], headers: Mapping[str, str] | None = None
+) -> Response:
+    """Ответ, сериализованный orjson напрямую, минуя response_model."""
+    return Response(
+        content=orjson.dumps(content, option=_ORJSON_OPTIONS),
+        media_type="application/json",
+        headers=headers,
+    )
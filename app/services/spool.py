@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import os
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+import msgpack
+
+from app.services.kafka_codecs import Headers
+from app.services.utils import (
+    KAFKA_SPOOL_BYTES,
+    KAFKA_SPOOL_OLDEST_AGE_SECONDS,
+    KAFKA_SPOOL_RECORDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# (key, value, headers) — запись, уже закодированная кодеком
+Record = Tuple[bytes | None, bytes, Headers]
+
+
+class SpoolFullError(Exception):
+    """Спул достиг KAFKA_SPOOL_MAX_BYTES и не принимает новые записи."""
+
+
+class KafkaSpool:
+    """
+    Локальный write-ahead спул для записей, которые не удалось отдать в Kafka.
+
+    Хранится в виде append-only сегментов `<время создания, нс>.spool`:
+    каждая запись — msgpack-кадр [topic, key, value, headers].
+    Незаписанный до конца последний кадр (падение процесса во время записи)
+    при чтении отбрасывается. Сегменты воспроизводятся и удаляются строго
+    по порядку создания.
+    """
+
+    SUFFIX = ".spool"
+
+    def __init__(self, directory: str, segment_max_bytes: int, max_bytes: int):
+        self.directory = Path(directory)
+        self.segment_max_bytes = segment_max_bytes
+        self.max_bytes = max_bytes
+        self._lock = asyncio.Lock()
+        self._current: Path | None = None
+        self._current_file = None
+        self._sizes: dict[Path, Tuple[int, int]] = {}  # путь -> (записей, байт)
+
+    def open(self):
+        """Создаёт каталог и подхватывает сегменты, оставшиеся с прошлого запуска."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for path in self._segments():
+            self._sizes[path] = (
+                sum(1 for _ in self._iter_frames(path)),
+                path.stat().st_size,
+            )
+        self._update_metrics()
+        KAFKA_SPOOL_OLDEST_AGE_SECONDS.set_function(self.oldest_age_seconds)
+        if self._sizes:
+            logger.info(
+                f"Спул Kafka: найдено {self.records} записей в {len(self._sizes)} сегментах"
+            )
+
+    def close(self):
+        if self._current_file is not None:
+            self._current_file.close()
+            self._current_file = None
+            self._current = None
+
+    @property
+    def records(self) -> int:
+        return sum(records for records, _ in self._sizes.values())
+
+    @property
+    def size_bytes(self) -> int:
+        return sum(size for _, size in self._sizes.values())
+
+    @property
+    def pending(self) -> bool:
+        return bool(self._sizes)
+
+    def oldest_age_seconds(self) -> float:
+        segments = self._segments()
+        if not segments:
+            return 0.0
+        return max(0.0, time.time() - int(segments[0].stem) / 1e9)
+
+    async def append(self, topic: str, records: List[Record]):
+        if not records:
+            return
+        frames = b"".join(
+            msgpack.packb([topic, key, value, [list(h) for h in headers]])
+            for key, value, headers in records
+        )
+        async with self._lock:
+            if self.size_bytes + len(frames) > self.max_bytes:
+                raise SpoolFullError(
+                    f"Спул Kafka переполнен ({self.size_bytes} байт)"
+                )
+            await asyncio.to_thread(self._write, frames)
+            count, size = self._sizes.get(self._current, (0, 0))
+            self._sizes[self._current] = (count + len(records), size + len(frames))
+            self._update_metrics()
+
+    async def oldest(self) -> Path | None:
+        """
+        Возвращает самый старый сегмент для воспроизведения.
+        Текущий сегмент закрывается, чтобы новые записи шли уже в следующий.
+        """
+        async with self._lock:
+            segments = self._segments()
+            if not segments:
+                return None
+            if segments[0] == self._current:
+                self.close()
+            return segments[0]
+
+    async def read(self, path: Path) -> List[Tuple[str, bytes | None, bytes, Headers]]:
+        def _read():
+            return [
+                (topic, key, value, [tuple(h) for h in headers])
+                for topic, key, value, headers in self._iter_frames(path)
+            ]
+
+        return await asyncio.to_thread(_read)
+
+    async def remove(self, path: Path):
+        async with self._lock:
+            await asyncio.to_thread(path.unlink, True)
+            self._sizes.pop(path, None)
+            self._update_metrics()
+
+    def _write(self, frames: bytes):
+        if (
+            self._current_file is None
+            or self._current_file.tell() + len(frames) > self.segment_max_bytes
+        ):
+            self.close()
+            self._current = self.directory / f"{time.time_ns():020d}{self.SUFFIX}"
+            self._current_file = open(self._current, "ab")
+        self._current_file.write(frames)
+        self._current_file.flush()
+        os.fsync(self._current_file.fileno())
+
+    def _segments(self) -> List[Path]:
+        return sorted(self.directory.glob(f"*{self.SUFFIX}"))
+
+    @staticmethod
+    def _iter_frames(path: Path):
+        with open(path, "rb") as f:
+            unpacker = msgpack.Unpacker(f, use_list=True)
+            try:
+                for frame in unpacker:
+                    yield frame
+            except (msgpack.OutOfData, ValueError):
+                logger.warning(f"Обрезанный кадр в конце сегмента спула {path}")
+
+    def _update_metrics(self):
+        KAFKA_SPOOL_RECORDS.set(self.records)
+        KAFKA_SPOOL_BYTES.set(self.size_bytes)
@@ -0,0 +1,308 @@
+import codecs
+import json
+import zlib
+from typing import AsyncIterator, Callable
+
+import zstandard
+from fastapi import HTTPException, status
+from fastapi.routing import APIRoute
+from starlette.requests import Request
+
+from app.services.utils import INGEST_COMPRESSED_BYTES, INGEST_DECOMPRESSED_BYTES
+from app.settings import settings
+
+NDJSON_CONTENT_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl"}
+
+# Размер порции распакованных данных, которую отдаём дальше за один шаг
+_DECOMPRESS_OUT_CHUNK = 64 * 1024
+# Размер порции сжатых данных, подаваемой в zstd за один шаг
+_ZSTD_IN_CHUNK = 256
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+
+
+class StreamParseError(ValueError):
+    """Тело запроса не является корректным NDJSON / JSON-массивом объектов."""
+
+
+def _check_item(item) -> dict:
+    if not isinstance(item, dict):
+        raise StreamParseError("Каждый элемент должен быть JSON-объектом")
+    return item
+
+
+def _check_buffer(buf: str):
+    if len(buf) > settings.INGEST_STREAM_MAX_ITEM_BYTES:
+        raise StreamParseError(
+            "Элемент превышает INGEST_STREAM_MAX_ITEM_BYTES"
+        )
+
+
+async def _iter_text(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Декодирует поток байт в UTF-8, не разрывая многобайтовые символы."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    async for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[dict]:
+    """
+    Разбирает NDJSON (один JSON-объект на строку) по мере поступления данных.
+    В памяти держится только текущая неполная строка.
+    """
+    buf = ""
+    async for text in _iter_text(chunks):
+        buf += text
+        *lines, buf = buf.split("\n")
+        for line in lines:
+            if line.strip():
+                yield _check_item(_loads(line))
+        _check_buffer(buf)
+    if buf.strip():
+        yield _check_item(_loads(buf))
+
+
+async def iter_json_array(chunks: AsyncIterator[bytes]) -> AsyncIterator[dict]:
+    """
+    Инкрементально разбирает JSON-массив объектов `[{...}, {...}, ...]`:
+    каждый элемент отдаётся сразу, как только он полностью получен.
+    """
+    buf = ""
+    pos = 0
+    started = finished = False
+    # Что допустимо следующим: элемент (после "[" или ",") или "," / "]"
+    # (после элемента); пустой массив "[]" — единственный случай "]" без элемента
+    expect_item = True
+    has_items = False
+
+    async for text in _iter_text(chunks):
+        buf = buf[pos:] + text
+        pos = 0
+        while True:
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            if pos == len(buf):
+                break
+            if finished:
+                raise StreamParseError("Лишние данные после конца массива")
+            if not started:
+                if buf[pos] != "[":
+                    raise StreamParseError("Ожидался JSON-массив")
+                started = True
+                pos += 1
+                continue
+            if buf[pos] == ",":
+                if expect_item:
+                    raise StreamParseError("Лишняя запятая в JSON-массиве")
+                expect_item = True
+                pos += 1
+                continue
+            if buf[pos] == "]":
+                if expect_item and has_items:
+                    raise StreamParseError("Запятая перед концом JSON-массива")
+                finished = True
+                pos += 1
+                continue
+            if not expect_item:
+                raise StreamParseError("Пропущена запятая между элементами JSON-массива")
+            try:
+                item, end = _decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # Элемент ещё не пришёл целиком — ждём следующий чанк
+                break
+            pos = end
+            expect_item = False
+            has_items = True
+            yield _check_item(item)
+        _check_buffer(buf[pos:])
+
+    if not finished:
+        raise StreamParseError("Неполный JSON-массив")
+
+
+def _size_exceeded() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail="Decompressed body exceeds INGEST_MAX_DECOMPRESSED_BYTES",
+    )
+
+
+def _corrupt_body(encoding: str, e: Exception) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Invalid {encoding} body: {e}",
+    )
+
+
+async def _inflate(
+    chunks: AsyncIterator[bytes], new_decompressor: Callable, encoding: str
+) -> AsyncIterator[bytes]:
+    # max_length ограничивает вывод на каждом шаге, поэтому «zip-бомба»
+    # не распаковывается в память целиком до проверки лимита
+    d = new_decompressor()
+    async for chunk in chunks:
+        data = chunk
+        while data:
+            try:
+                out = d.decompress(data, _DECOMPRESS_OUT_CHUNK)
+            except zlib.error as e:
+                raise _corrupt_body(encoding, e)
+            if out:
+                yield out
+            data = d.unconsumed_tail
+            if not data and d.eof and d.unused_data:
+                # gzip из нескольких склеенных members
+                data = d.unused_data
+                d = new_decompressor()
+    if not d.eof:
+        raise _corrupt_body(encoding, ValueError("unexpected end of stream"))
+
+
+async def _unzstd(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    # У zstd decompressobj нет max_length, поэтому вход подаётся мелкими
+    # порциями: даже RLE-блоки дают за шаг не больше ~32K * _ZSTD_IN_CHUNK байт
+    d = zstandard.ZstdDecompressor().decompressobj(write_size=_DECOMPRESS_OUT_CHUNK)
+    async for chunk in chunks:
+        for i in range(0, len(chunk), _ZSTD_IN_CHUNK):
+            data = chunk[i : i + _ZSTD_IN_CHUNK]
+            while data:
+                try:
+                    out = d.decompress(data)
+                except zstandard.ZstdError as e:
+                    raise _corrupt_body("zstd", e)
+                if out:
+                    yield out
+                # несколько склеенных zstd-фреймов
+                data = d.unused_data if d.eof else b""
+                if data:
+                    d = zstandard.ZstdDecompressor().decompressobj(
+                        write_size=_DECOMPRESS_OUT_CHUNK
+                    )
+    if not d.eof:
+        raise _corrupt_body("zstd", ValueError("unexpected end of stream"))
+
+
+async def decompress_stream(
+    chunks: AsyncIterator[bytes], encoding: str | None
+) -> AsyncIterator[bytes]:
+    """
+    Распаковывает тело запроса по Content-Encoding (gzip, deflate, zstd)
+    на лету и считает сжатые / распакованные байты в метриках.
+    Лимит INGEST_MAX_DECOMPRESSED_BYTES защищает от «zip-бомб» и действует
+    только на сжатые тела (Content-Encoding, отличный от identity).
+    """
+    encoding = (encoding or "identity").strip().lower()
+    limit = (
+        None if encoding == "identity" else settings.INGEST_MAX_DECOMPRESSED_BYTES
+    )
+
+    async def counted(source: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        async for chunk in source:
+            INGEST_COMPRESSED_BYTES.labels(encoding=encoding).inc(len(chunk))
+            yield chunk
+
+    if encoding == "identity":
+        decompressed = counted(chunks)
+    elif encoding in ("gzip", "x-gzip"):
+        decompressed = _inflate(
+            counted(chunks), lambda: zlib.decompressobj(16 + zlib.MAX_WBITS), encoding
+        )
+    elif encoding == "deflate":
+        decompressed = _inflate(counted(chunks), zlib.decompressobj, encoding)
+    elif encoding == "zstd":
+        decompressed = _unzstd(counted(chunks))
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Unsupported Content-Encoding: {encoding}",
+        )
+
+    total = 0
+    async for chunk in decompressed:
+        total += len(chunk)
+        if limit is not None and total > limit:
+            raise _size_exceeded()
+        INGEST_DECOMPRESSED_BYTES.labels(encoding=encoding).inc(len(chunk))
+        yield chunk
+
+
+class DecompressedRequest(Request):
+    """
+    Request, у которого stream() (а значит и body()) отдаёт распакованные данные.
+    bytes_read — сколько распакованных байт тела уже прочитано;
+    больше max_bytes (если задан) прочитать нельзя — поднимается too_large().
+    """
+
+    bytes_read = 0
+    max_bytes: int | None = None
+    too_large: Callable[[], HTTPException] = staticmethod(_size_exceeded)
+
+    async def stream(self) -> AsyncIterator[bytes]:
+        if hasattr(self, "_body"):
+            yield self._body
+            yield b""
+            return
+        async for chunk in decompress_stream(
+            super().stream(), self.headers.get("content-encoding")
+        ):
+            self.bytes_read += len(chunk)
+            if self.max_bytes is not None and self.bytes_read > self.max_bytes:
+                raise self.too_large()
+            yield chunk
+
+
+class DecompressingRoute(APIRoute):
+    """
+    APIRoute, распаковывающий сжатые тела запросов (Content-Encoding)
+    до разбора FastAPI — как для List[dict]-хэндлеров, так и для потоковых.
+    Наследники могут ограничить распакованное тело (max_body_bytes)
+    и отклонить запрос до чтения тела (admit).
+    """
+
+    max_body_bytes: int | None = None
+
+    def admit(self, request: Request):
+        """Проверки запроса до чтения тела; по умолчанию — никаких."""
+
+    def body_too_large(self) -> HTTPException:
+        return _size_exceeded()
+
+    def get_route_handler(self) -> Callable:
+        original_route_handler = super().get_route_handler()
+
+        async def custom_route_handler(request: Request):
+            self.admit(request)
+            request = DecompressedRequest(request.scope, request.receive)
+            request.max_bytes = self.max_body_bytes
+            request.too_large = self.body_too_large
+            return await original_route_handler(request)
+
+        return custom_route_handler
+
+
+async def iter_request_items(request: Request) -> AsyncIterator[dict]:
+    """
+    Потоково читает элементы из тела запроса: NDJSON для
+    application/x-ndjson, иначе — JSON-массив.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    chunks = request.stream()
+    if content_type in NDJSON_CONTENT_TYPES:
+        parser = iter_ndjson(chunks)
+    else:
+        parser = iter_json_array(chunks)
+    async for item in parser:
+        yield item
+
+
+def _loads(line: str):
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError as e:
+        raise StreamParseError(f"Некорректная строка NDJSON: {e}") from e
@@ -0,0 +1,66 @@
+import logging
+from datetime import timezone
+from typing import List
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import SyncStateItem
+from app.services.db.schemas import RawRecords
+from app.services.redisClient import redis_client_async
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _sync_state_key(email: str) -> str:
+    return f"{settings.REDIS_SYNC_STATE_NAMESPACE}{email}"
+
+
+async def get_sync_state(session: AsyncSession, email: str) -> List[SyncStateItem]:
+    """
+    Watermark пользователя по raw_records: max(time) и число записей
+    по каждому типу данных. Результат кешируется в Redis-хеше
+    (поле — dataType) на SYNC_STATE_TTL_SECONDS и сбрасывается,
+    когда сервис обработки сообщает о прогрессе (POST /post_data/progress).
+    """
+    key = _sync_state_key(email)
+    try:
+        cached = await redis_client_async.hgetall(key)
+    except Exception as e:
+        logger.warning(f"Кеш sync_state недоступен: {e!r}")
+        cached = None
+    if cached:
+        return [SyncStateItem.model_validate_json(cached[k]) for k in sorted(cached)]
+
+    stmt = (
+        select(RawRecords.data_type, func.max(RawRecords.time), func.count())
+        .where(RawRecords.email == email)
+        .group_by(RawRecords.data_type)
+        .order_by(RawRecords.data_type)
+    )
+    rows = (await session.execute(stmt)).all()
+    items = [
+        SyncStateItem(
+            dataType=data_type,
+            lastX=last_time.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            count=count,
+        )
+        for data_type, last_time, count in rows
+    ]
+
+    if items:
+        try:
+            async with redis_client_async.pipeline(transaction=True) as pipe:
+                pipe.hset(
+                    key, mapping={item.dataType: item.model_dump_json() for item in items}
+                )
+                pipe.expire(key, settings.SYNC_STATE_TTL_SECONDS)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить sync_state в Redis: {e!r}")
+    return items
+
+
+async def invalidate_sync_state(email: str):
+    await redis_client_async.delete(_sync_state_key(email))
@@ -0,0 +1,133 @@
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Tuple
+
+from jose import jwt
+
+from app.models.models import TokenData
+from app.services.redisClient import redis_client_async
+from app.services.utils import AUTH_TOKEN_CACHE_LOOKUPS
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Значение в Redis для токена, который auth-сервис отклонил
+_REJECTED = "rejected"
+
+
+class TokenCache:
+    """
+    Кеш результата проверки токена в auth-сервисе: token -> TokenData.
+
+    Первый уровень — LRU в памяти процесса, второй (опционально,
+    AUTH_TOKEN_CACHE_REDIS_ENABLED) — Redis, общий для всех реплик.
+    Отклонённые токены (401/403) кешируются на AUTH_TOKEN_CACHE_NEGATIVE_TTL_SECONDS,
+    чтобы повторы с протухшим токеном не нагружали auth-сервис.
+    Ключом служит sha256 токена, сам токен нигде не хранится.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl_seconds: float,
+        negative_ttl_seconds: float,
+        redis_enabled: bool,
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.redis_enabled = redis_enabled
+        # digest -> (expires_at, TokenData | None)
+        self._entries: "OrderedDict[str, Tuple[float, TokenData | None]]" = (
+            OrderedDict()
+        )
+
+    @staticmethod
+    def _digest(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _redis_key(digest: str) -> str:
+        return f"{settings.REDIS_AUTH_TOKEN_CACHE_NAMESPACE}{digest}"
+
+    def _ttl_for(self, token: str) -> float:
+        """TTL записи не должен переживать срок действия самого JWT."""
+        try:
+            exp = jwt.get_unverified_claims(token).get("exp")
+        except Exception:
+            return self.ttl_seconds
+        if exp is None:
+            return self.ttl_seconds
+        return max(0.0, min(self.ttl_seconds, float(exp) - time.time()))
+
+    async def get(self, token: str) -> Tuple[bool, TokenData | None]:
+        """
+        Возвращает (найдено, пользователь). Найденный None означает,
+        что токен недавно был отклонён auth-сервисом.
+        """
+        digest = self._digest(token)
+        entry = self._entries.get(digest)
+        if entry is not None:
+            expires_at, user = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(digest)
+                AUTH_TOKEN_CACHE_LOOKUPS.labels(tier="memory", result="hit").inc()
+                return True, user
+            del self._entries[digest]
+        AUTH_TOKEN_CACHE_LOOKUPS.labels(tier="memory", result="miss").inc()
+
+        if not self.redis_enabled:
+            return False, None
+        try:
+            key = self._redis_key(digest)
+            async with redis_client_async.pipeline(transaction=False) as pipe:
+                pipe.get(key)
+                pipe.ttl(key)
+                payload, ttl = await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Кеш токенов в Redis недоступен: {e!r}")
+            return False, None
+        if payload is None:
+            AUTH_TOKEN_CACHE_LOOKUPS.labels(tier="redis", result="miss").inc()
+            return False, None
+
+        AUTH_TOKEN_CACHE_LOOKUPS.labels(tier="redis", result="hit").inc()
+        user = None if payload == _REJECTED else TokenData.model_validate_json(payload)
+        if ttl and ttl > 0:
+            self._remember(digest, user, ttl)
+        return True, user
+
+    async def put(self, token: str, user: TokenData | None):
+        """Сохраняет результат проверки; user=None — токен отклонён."""
+        ttl = self.negative_ttl_seconds if user is None else self._ttl_for(token)
+        if ttl <= 0:
+            return
+        digest = self._digest(token)
+        self._remember(digest, user, ttl)
+
+        if not self.redis_enabled:
+            return
+        try:
+            await redis_client_async.set(
+                self._redis_key(digest),
+                _REJECTED if user is None else user.model_dump_json(),
+                ex=max(1, int(ttl)),
+            )
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить токен в Redis: {e!r}")
+
+    def _remember(self, digest: str, user: TokenData | None, ttl: float):
+        self._entries[digest] = (time.monotonic() + ttl, user)
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+token_cache = TokenCache(
+    settings.AUTH_TOKEN_CACHE_MAX_SIZE,
+    settings.AUTH_TOKEN_CACHE_TTL_SECONDS,
+    settings.AUTH_TOKEN_CACHE_NEGATIVE_TTL_SECONDS,
+    settings.AUTH_TOKEN_CACHE_REDIS_ENABLED,
+)
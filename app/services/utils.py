@@ -50,6 +50,101 @@ REQUESTS_IN_PROGRESS = Gauge(
     ["method", "path", "app_name"],
 )
 
+INGEST_COMPRESSED_BYTES = Counter(
+    "ingest_request_compressed_bytes_total",
+    "Total bytes of ingest request bodies as received on the wire, by Content-Encoding.",
+    ["encoding"],
+)
+INGEST_DECOMPRESSED_BYTES = Counter(
+    "ingest_request_decompressed_bytes_total",
+    "Total bytes of ingest request bodies after decompression, by Content-Encoding.",
+    ["encoding"],
+)
+
+KAFKA_SPOOL_RECORDS = Gauge(
+    "kafka_spool_records",
+    "Number of records waiting in the on-disk Kafka spool.",
+)
+KAFKA_SPOOL_BYTES = Gauge(
+    "kafka_spool_bytes",
+    "Size of the on-disk Kafka spool in bytes.",
+)
+KAFKA_SPOOL_OLDEST_AGE_SECONDS = Gauge(
+    "kafka_spool_oldest_age_seconds",
+    "Age of the oldest spool segment that has not been replayed yet.",
+)
+KAFKA_SPOOLED_RECORDS = Counter(
+    "kafka_spooled_records_total",
+    "Total records written to the Kafka spool instead of the broker, by reason.",
+    ["reason"],
+)
+KAFKA_SPOOL_REPLAYED_RECORDS = Counter(
+    "kafka_spool_replayed_records_total",
+    "Total records replayed from the Kafka spool to the broker.",
+)
+
+INGEST_INFLIGHT_MESSAGES = Gauge(
+    "ingest_inflight_messages",
+    "Messages accepted by ingestion routes and not yet delivered to Kafka or the spool.",
+)
+INGEST_INFLIGHT_BYTES = Gauge(
+    "ingest_inflight_bytes",
+    "Request body bytes accepted by ingestion routes and not yet delivered.",
+)
+INGEST_REJECTED = Counter(
+    "ingest_rejected_requests_total",
+    "Total ingestion requests rejected by admission control, by reason.",
+    ["reason"],
+)
+INGEST_DEDUP_ITEMS = Counter(
+    "ingest_dedup_items_total",
+    "Total ingested items checked for duplicates, by result (hit = dropped, "
+    "miss = sent to Kafka, bypass = dedup unavailable).",
+    ["data_type", "result"],
+)
+
+LATEST_ITERATION_LOOKUPS = Counter(
+    "latest_iteration_lookups_total",
+    "Total latest_iterations reads with LATEST_ITERATIONS_ENABLED, by kind and result "
+    "(hit = row found, miss = fell back to max() over history).",
+    ["kind", "result"],
+)
+
+AUTH_TOKEN_CACHE_LOOKUPS = Counter(
+    "auth_token_cache_lookups_total",
+    "Total token cache lookups in get_current_user, by tier (memory, redis) and result.",
+    ["tier", "result"],
+)
+AUTH_API_REQUESTS = Counter(
+    "auth_api_requests_total",
+    "Total token validation requests sent to the auth service, by response status.",
+    ["status"],
+)
+AUTH_API_COALESCED = Counter(
+    "auth_api_coalesced_requests_total",
+    "Total token validations that joined an in-flight auth service request.",
+)
+AUTH_JWT_VERIFICATIONS = Counter(
+    "auth_jwt_verifications_total",
+    "Total local JWT verifications, by result (valid, invalid, fallback to auth service).",
+    ["result"],
+)
+SERIES_CACHE_LOOKUPS = Counter(
+    "series_cache_lookups_total",
+    "Total series response cache lookups, by source (raw, processed) and result.",
+    ["source", "result"],
+)
+SERIES_CACHE_BYTES_SAVED = Counter(
+    "series_cache_bytes_saved_total",
+    "Total response body bytes served from the series cache instead of the database.",
+    ["source"],
+)
+SERIES_CACHE_STORED_BYTES = Counter(
+    "series_cache_stored_bytes_total",
+    "Total bytes of series responses written to the cache, by encoding "
+    "(identity = before compression, zlib = stored).",
+    ["encoding"],
+)
 
 class PrometheusMiddleware(BaseHTTPMiddleware):
     def __init__(self, app: ASGIApp, app_name: str = "fastapi-app") -> None:
@@ -57,10 +57,60 @@ class Settings(BaseSettings):
     KAFKA_BOOTSTRAP_SERVERS: str | None = "localhost:9092"
 
     RAW_DATA_KAFKA_TOPIC_NAME: str | None = "raw_data_topic"
+    KAFKA_PRODUCER_MAX_BATCH_SIZE: int | None = 512 * 1024
+    KAFKA_PRODUCER_MAX_REQUEST_SIZE: int | None = 1024 * 1024
+    KAFKA_PRODUCER_LINGER_MS: int | None = 20
+    # Сколько ждать метаданные и место в буфере продюсера при постановке
+    # батча в очередь; дольше — брокер считаем недоступным и пишем в спул
+    KAFKA_ENQUEUE_TIMEOUT_SECONDS: float | None = 2
+    # Формат значений в RAW_DATA_KAFKA_TOPIC_NAME: json | msgpack
+    KAFKA_VALUE_CODEC: str | None = "json"
+    # Версия схемы значения: 1 — с userData (её читает текущий консьюмер),
+    # 2 — без userData, пользователь только в ключе и заголовках записи.
+    # Переключать на 2 после того, как консьюмер перейдёт на ключ и заголовки
+    KAFKA_VALUE_SCHEMA_VERSION: int | None = 1
+    # Поле TokenData, используемое как ключ записи: email | google_sub
+    KAFKA_RECORD_KEY_FIELD: str | None = "email"
+
+    KAFKA_SPOOL_ENABLED: bool = True
+    KAFKA_SPOOL_DIR: str | None = "/var/lib/data-collection-api/kafka-spool"
+    KAFKA_SPOOL_SEGMENT_MAX_BYTES: int | None = 16 * 1024 * 1024
+    KAFKA_SPOOL_MAX_BYTES: int | None = 1024 * 1024 * 1024
+    KAFKA_SPOOL_DRAIN_INTERVAL_SECONDS: float | None = 5
+
+    INGEST_STREAM_CHUNK_SIZE: int | None = 1000
+    INGEST_STREAM_MAX_ITEM_BYTES: int | None = 1024 * 1024
+    INGEST_MAX_DECOMPRESSED_BYTES: int | None = 128 * 1024 * 1024
+    INGEST_MAX_INFLIGHT_MESSAGES: int | None = 200_000
+    INGEST_MAX_INFLIGHT_BYTES: int | None = 256 * 1024 * 1024
+    INGEST_RETRY_AFTER_SECONDS: int | None = 5
 
     DOMAIN_NAME: str | None = "http://hse-coursework-health.ru"
     AUTH_API_URL: str | None = f"{DOMAIN_NAME}:8081"
     AUTH_API_USER_INFO_PATH: str | None = "/auth-api/api/v1/auth/users/me"
+    # remote — каждый токен проверяется запросом в AUTH_API_USER_INFO_PATH,
+    # jwt — подпись и claims проверяются локально по JWKS auth-сервиса
+    AUTH_MODE: str | None = "remote"
+    AUTH_JWKS_URL: str | None = f"{AUTH_API_URL}/auth-api/.well-known/jwks.json"
+    AUTH_JWT_ALGORITHMS: list[str] = ["RS256"]
+    AUTH_JWT_AUDIENCE: str | None = None
+    AUTH_JWT_ISSUER: str | None = None
+    AUTH_JWKS_REFRESH_INTERVAL_SECONDS: float | None = 60 * 60
+    AUTH_JWKS_MIN_REFRESH_INTERVAL_SECONDS: float | None = 30
+    # Bearer-токен сервиса обработки для внутренних эндпоинтов
+    # (POST /post_data/iteration_completed); пока не задан, они закрыты
+    PROCESSING_SERVICE_TOKEN: str | None = None
+
+    HTTP_CLIENT_LIMIT: int | None = 100
+    HTTP_CLIENT_LIMIT_PER_HOST: int | None = 32
+    HTTP_CLIENT_KEEPALIVE_TIMEOUT_SECONDS: float | None = 30
+    HTTP_CLIENT_TIMEOUT_SECONDS: float | None = 10
+
+    AUTH_TOKEN_CACHE_MAX_SIZE: int | None = 10_000
+    AUTH_TOKEN_CACHE_TTL_SECONDS: float | None = 5 * 60
+    AUTH_TOKEN_CACHE_NEGATIVE_TTL_SECONDS: float | None = 10
+    # Общий для реплик уровень кеша токенов в Redis
+    AUTH_TOKEN_CACHE_REDIS_ENABLED: bool = False
 
     REDIS_HOST: str | None = "localhost"
     REDIS_PORT: str | None = "6379"
@@ -74,8 +124,38 @@ class Settings(BaseSettings):
     REDIS_FIND_OUTLIERS_JOB_IS_ACTIVE_NAMESPACE: str | None = (
         "REDIS_FIND_OUTLIERS_JOB_IS_ACTIVE_NAMESPACE-"
     )
+    # Брать последнюю итерацию выбросов / прогнозов из latest_iterations.
+    # Включать, когда сервис обработки вызывает POST /post_data/iteration_completed
+    # (миграция f79bb4f1426f заполняет таблицу по истории); до этого, а также
+    # для пользователей без строки там — max() по истории. После включения
+    # доля result="miss" в latest_iteration_lookups_total показывает, сколько
+    # чтений ещё уходит в историю — при исправном сервисе обработки она ~0
+    LATEST_ITERATIONS_ENABLED: bool = False
+    REDIS_INGEST_STATUS_NAMESPACE: str | None = "REDIS_INGEST_STATUS_NAMESPACE-"
+    INGEST_STATUS_TTL_SECONDS: int | None = 24 * 60 * 60
+    REDIS_INGEST_DEDUP_NAMESPACE: str | None = "REDIS_INGEST_DEDUP_NAMESPACE-"
+    # Хеши пишутся только после доставки в Kafka / спул, поэтому повтор
+    # выгрузки, потерянной при падении пода, не отбрасывается
+    INGEST_DEDUP_ENABLED: bool = True
+    # Длина поколения множества хешей; повтор ловится в окне от 1 до 2 TTL
+    INGEST_DEDUP_TTL_SECONDS: int | None = 7 * 24 * 60 * 60
+    REDIS_AUTH_TOKEN_CACHE_NAMESPACE: str | None = "REDIS_AUTH_TOKEN_CACHE_NAMESPACE-"
+    REDIS_SYNC_STATE_NAMESPACE: str | None = "REDIS_SYNC_STATE_NAMESPACE-"
+    SYNC_STATE_TTL_SECONDS: int | None = 10 * 60
+    REDIS_SERIES_CACHE_NAMESPACE: str | None = "REDIS_SERIES_CACHE_NAMESPACE-"
+    SERIES_CACHE_ENABLED: bool = True
+    SERIES_CACHE_TTL_SECONDS: int | None = 10 * 60
+    # Ответы больше этого размера (до сжатия) не кешируются
+    SERIES_CACHE_MAX_BYTES: int | None = 8 * 1024 * 1024
+    SERIES_CACHE_COMPRESSION_LEVEL: int | None = 1
 
     BATCH_SIZE: int | None = 100
+    # Наибольшая страница /get_data/{raw,processed}_data; она же размер
+    # страницы по умолчанию. Ряды длиннее отдаются по курсору X-Next-Cursor
+    SERIES_MAX_PAGE_SIZE: int | None = 50_000
+    # Сколько точек окна [from, to) можно прочитать для прореживания LTTB
+    # (max_points); окно больше отклоняется с 400
+    SERIES_DOWNSAMPLE_MAX_SOURCE_POINTS: int | None = 200_000
 
     OTLP_GRPC_ENDPOINT: str | None = "tempo:4317"
     LOKI_URL: str | None = "http://loki:3100/loki/api/v1/push"
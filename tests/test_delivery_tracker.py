@@ -0,0 +1,111 @@
+import asyncio
+import unittest
+
+from aiokafka.errors import KafkaError
+
+from app.services.ingest_status import DeliveryTracker
+from app.services.kafka import KafkaClient
+
+
+class FakeBatch:
+    """Батч на два сообщения, как маленький KAFKA_PRODUCER_MAX_BATCH_SIZE."""
+
+    def __init__(self):
+        self.count = 0
+
+    def append(self, **kwargs):
+        if self.count >= 2:
+            return None
+        self.count += 1
+        return object()
+
+    def record_count(self):
+        return self.count
+
+
+class FakeProducer:
+    """Продюсер, у которого батчи с номерами из failing не доставляются."""
+
+    def __init__(self, failing):
+        self.failing = failing
+        self.sent = 0
+
+    async def partitions_for(self, topic):
+        return {0}
+
+    def create_batch(self):
+        return FakeBatch()
+
+    async def send_batch(self, batch, topic, partition):
+        future = asyncio.get_running_loop().create_future()
+        if self.sent in self.failing:
+            future.set_exception(KafkaError(f"batch {self.sent}"))
+        else:
+            future.set_result(None)
+        self.sent += 1
+        return future
+
+
+class FakeSpool:
+    pending = False
+
+    def __init__(self):
+        self.values = []
+
+    async def append(self, topic, records):
+        self.values += [value for _, value, _ in records]
+
+
+class FakeCodec:
+    headers = []
+
+    @staticmethod
+    def encode(value):
+        return value["n"]
+
+
+class DeliveryTrackerTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.client = KafkaClient()
+        self.saved = (self.client._producer, self.client._spool, self.client._codec)
+        self.client._codec = FakeCodec()
+        self.client._spool = FakeSpool()
+
+    def tearDown(self):
+        self.client._producer, self.client._spool, self.client._codec = self.saved
+
+    async def test_spooled_batch_is_not_reported_as_accepted(self):
+        # Батч 1 (элементы 2, 3) не доставлен и ушёл в спул,
+        # батч 2 (элементы 4, 5) — вслед за ним, чтобы не обогнать его
+        self.client._producer = FakeProducer(failing={1})
+        batches = await self.client.send_many(
+            "topic", [{"n": i} for i in range(6)], key=b"user"
+        )
+
+        tracker = DeliveryTracker()
+        tracker.add(batches, list(range(6)))
+        result = await tracker.result("HeartRateRecord")
+
+        self.assertEqual(result.accepted, 2)
+        self.assertEqual(result.spooled, 4)
+        self.assertEqual(result.spooledRanges, [[2, 6]])
+        self.assertEqual(result.failed, 0)
+        self.assertEqual(result.failedRanges, [])
+        self.assertEqual(self.client._spool.values, [2, 3, 4, 5])
+
+    async def test_all_delivered(self):
+        self.client._producer = FakeProducer(failing=set())
+        batches = await self.client.send_many(
+            "topic", [{"n": i} for i in range(3)], key=b"user"
+        )
+
+        tracker = DeliveryTracker()
+        tracker.add(batches, [0, 2, 5])
+        result = await tracker.result("HeartRateRecord")
+
+        self.assertEqual((result.accepted, result.spooled, result.failed), (3, 0, 0))
+        self.assertEqual(self.client._spool.values, [])
+
+
+if __name__ == "__main__":
+    unittest.main()